@@ -2,7 +2,32 @@
 Debug script to inspect state diagram SVG structure
 """
 import asyncio
-from playwright.async_api import async_playwright
+import os
+from urllib.parse import urlsplit
+
+from playwright.async_api import Route, async_playwright
+
+from src.engine.browser_pool import BLOCKED_HOSTS, BLOCKED_RESOURCE_TYPES, CHROMIUM_ARGS
+
+# Set INSPECT=1 to keep the browser open for a few seconds after printing
+INSPECT = os.environ.get("INSPECT") == "1"
+# Set HEADFUL=1 to watch the render in a visible window
+HEADLESS = os.environ.get("HEADFUL") != "1"
+
+# Only the SVG's structure is inspected, so unlike the engine this script can
+# also skip images and fonts; the Mermaid script itself is all it needs
+DEBUG_BLOCKED_TYPES = BLOCKED_RESOURCE_TYPES | {"image", "font"}
+
+
+async def block_noise(route: Route) -> None:
+    """Abort requests that play no part in inspecting the diagram."""
+    request = route.request
+    host = urlsplit(request.url).hostname or ""
+    if request.resource_type in DEBUG_BLOCKED_TYPES or host.endswith(BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
 
 async def inspect_state_diagram():
     mermaid_code = """
@@ -29,8 +54,20 @@ stateDiagram-v2
         }});
         
         async function render() {{
-            const {{ svg }} = await mermaid.render('diagram', `{mermaid_code}`);
+            let svg;
+            try {{
+                ({{ svg }} = await mermaid.render('diagram', `{mermaid_code}`));
+            }} catch (error) {{
+                window.notifyRenderDone({{ ok: false, error: error.toString() }});
+                return;
+            }}
             document.getElementById('diagram-container').innerHTML = svg;
+            const svgElement = document.querySelector('#diagram-container svg');
+            const rect = svgElement.getBoundingClientRect();
+            // Hand back the markup too, so Python needs no second round-trip
+            window.notifyRenderDone({{
+                ok: true, width: rect.width, height: rect.height, svg: svgElement.outerHTML
+            }});
             
             // Log all path and line elements with their classes
             const paths = document.querySelectorAll('path');
@@ -54,26 +91,40 @@ stateDiagram-v2
 """
     
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
+        # Same lean flags as the engine's shared browser
+        browser = await p.chromium.launch(headless=HEADLESS, args=CHROMIUM_ARGS)
         page = await browser.new_page()
+        await page.route("**/*", block_noise)
         
         page.on('console', lambda msg: print(f"BROWSER: {msg.text}"))
         
-        await page.set_content(html)
-        await asyncio.sleep(3)
+        # The page reports completion itself, so we resume as soon as the
+        # render finishes instead of polling for the SVG
+        render_done = asyncio.get_running_loop().create_future()
+        await page.expose_function(
+            "notifyRenderDone",
+            lambda status: render_done.done() or render_done.set_result(status)
+        )
+        
+        # The render callback is the real readiness signal, so there is no
+        # need to also wait for the load event
+        await page.set_content(html, wait_until="domcontentloaded")
+        
+        status = await asyncio.wait_for(render_done, timeout=10)
+        if not status["ok"]:
+            raise RuntimeError(f"Mermaid rendering failed: {status['error']}")
+        # A real diagram is at least 10px wide
+        if status["width"] < 10:
+            raise RuntimeError(f"Mermaid rendered an empty diagram: {status}")
         
-        # Get the outer HTML to see structure
-        svg_html = await page.evaluate("""
-            () => {
-                const svg = document.querySelector('svg');
-                return svg ? svg.outerHTML : 'NO SVG';
-            }
-        """)
+        # The render callback already carried the outer HTML
+        svg_html = status["svg"]
         
         print("\n=== SVG STRUCTURE ===")
         print(svg_html[:2000])  # First 2000 chars
         
-        await asyncio.sleep(5)
+        if INSPECT:
+            await asyncio.sleep(5)
         await browser.close()
 
 if __name__ == "__main__":
@@ -6,7 +6,6 @@ using LiteLLM with structured JSON output.
 """
 
 import json
-from typing import Any, Dict
 
 import litellm
 
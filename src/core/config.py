@@ -6,6 +6,7 @@ or .env file. Strict validation is enforced at startup.
 """
 
 import sys
+import tempfile
 from pathlib import Path
 from typing import Optional
 
@@ -67,14 +68,19 @@ class Config(BaseSettings):
         default=1920,
         ge=800,
         le=3840,
-        description="Browser viewport width",
+        description="Maximum width of captured frames",
     )
     
     viewport_height: int = Field(
         default=1080,
         ge=600,
         le=2160,
-        description="Browser viewport height",
+        description="Maximum height of captured frames",
+    )
+    
+    browser_cache_dir: Path = Field(
+        default=Path(tempfile.gettempdir()) / "mermaid2gif_cache",
+        description="Directory for cached browser assets such as Mermaid.js",
     )
     
     # ============================================
@@ -172,9 +178,6 @@ class Config(BaseSettings):
         return self
 
 
-from pydantic import model_validator
-
-
 def load_config() -> Config:
     """
     Load and validate configuration.
@@ -17,6 +17,7 @@ from ..engine.ffmpeg_processor import transcode_to_gif_node
 from ..engine.mermaid_validator import mermaid_validator
 from ..engine.animation_applicator import apply_animation_node
 from ..engine.capture_controller import capture_video_node
+from ..engine.browser_pool import prewarm
 from ..utils.logger import get_logger, configure_logging
 
 logger = get_logger("graph")
@@ -245,6 +246,9 @@ def run_graph(state: GraphState) -> GraphState:
     
     logger.start(state, {"input_type": state.get("raw_input_type")})
     
+    # Launch the browser while the LLM and validation nodes run
+    prewarm()
+    
     # Compile and run graph
     app = compile_graph()
     final_state = app.invoke(state)
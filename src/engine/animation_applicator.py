@@ -3,25 +3,145 @@ Animation Applicator for Mermaid.js SVG
 Injects path-based animations into rendered Mermaid diagrams with seamless looping
 """
 
-from playwright.async_api import async_playwright
+from .browser_pool import (
+    CONTENT_LOAD_TIMEOUT_MS,
+    close_quietly,
+    get_browser_pool,
+    operation_timeout_ms,
+    run_async,
+    run_sync,
+)
 from ..core.config import get_config
 from ..utils.logger import get_logger
 from typing import Dict, Any
-import asyncio
-import nest_asyncio
-
-# Allow nested event loops for LangGraph compatibility
-nest_asyncio.apply()
 
 logger = get_logger("animation_applicator")
 
 
+# Flow animation. Render pages install it once per context as an init script,
+# so each call only sends a short invocation instead of the full function body.
+FLOW_ANIMATION_JS = """
+window.__applyFlowAnimation = (duration) => {
+    // Find all paths that represent connections/arrows across different diagram types
+    // Flowcharts: .edgePath path, .flowchart-link
+    // Sequence diagrams: .messageLine0, .messageLine1, line[class*="messageLine"]
+    // Class diagrams: .relation line, path[class*="relation"]
+    // State diagrams: .transition path, path.transition, path[id*="transition"]
+    // ER diagrams: .er.relationshipLine path
+    // Only the diagram's own subtree is searched, not the whole document.
+    const root = document.querySelector('#diagram-container svg') || document;
+    const edgePaths = root.querySelectorAll(`
+        .edgePath path, 
+        .flowchart-link,
+        line[class*="messageLine"],
+        .messageLine0,
+        .messageLine1,
+        .relation line,
+        path[class*="relation"],
+        .transition path,
+        path.transition,
+        path[id*="transition"],
+        path[id*="edge"],
+        .er.relationshipLine path
+    `);
+
+    // Measure every path before touching any of them. getTotalLength() needs
+    // up-to-date style, so interleaving it with style writes would force a
+    // style recalc per path; reading first keeps it to one.
+    const lengths = Array.from(edgePaths, (path) => {
+        let pathLength;
+        try {
+            pathLength = path.getTotalLength();
+        } catch (e) {
+            // For <line> elements, calculate length manually
+            if (path.tagName === 'line') {
+                const x1 = parseFloat(path.getAttribute('x1') || 0);
+                const y1 = parseFloat(path.getAttribute('y1') || 0);
+                const x2 = parseFloat(path.getAttribute('x2') || 0);
+                const y2 = parseFloat(path.getAttribute('y2') || 0);
+                pathLength = Math.sqrt(Math.pow(x2 - x1, 2) + Math.pow(y2 - y1, 2));
+            } else {
+                return 0; // Skip if we can't get length
+            }
+        }
+        return pathLength;
+    });
+
+    let animatedCount = 0;
+
+    edgePaths.forEach((path, i) => {
+        const pathLength = lengths[i];
+        if (pathLength <= 0) return;
+
+        // Only the length is per path; the dash pattern, starting offset and
+        // animation are derived from it by the shared .flow-edge rule below
+        path.style.setProperty('--path-length', `${pathLength}px`);
+        path.classList.add('flow-edge');
+
+        animatedCount++;
+    });
+
+    // Insert all rules in a single stylesheet: one style recalc instead
+    // of one per animated path. Edges dash at 15% of their length with a 5%
+    // gap and flow from a full-length offset to 0 over the video length, so
+    // the loop is seamless. The !important overrides Mermaid's own ID-scoped
+    // dash styles (e.g. dotted links), as inline styles used to. Nodes also
+    // get a subtle pulse.
+    const styleSheet = document.createElement('style');
+    styleSheet.dataset.flowAnimation = '';
+    styleSheet.textContent = `
+        .flow-edge {
+            stroke-dasharray: calc(var(--path-length) * 0.15)
+                              calc(var(--path-length) * 0.05) !important;
+            animation: edgeFlow ${duration}s linear infinite !important;
+        }
+        @keyframes edgeFlow {
+            from {
+                stroke-dashoffset: var(--path-length);
+            }
+            to {
+                stroke-dashoffset: 0;
+            }
+        }
+        @keyframes nodePulse {
+            0%, 100% {
+                opacity: 1;
+            }
+            50% {
+                opacity: 0.95;
+            }
+        }
+        .node rect, .node circle, .node polygon,
+        .actor rect, .actor circle,
+        .classGroup rect {
+            animation: nodePulse ${duration * 1.5}s ease-in-out infinite;
+            transform-origin: center;
+        }
+    `;
+    document.head.appendChild(styleSheet);
+
+    return { 
+        success: true, 
+        pathsAnimated: animatedCount,
+        animationDuration: duration
+    };
+};
+"""
+
+
 def apply_animation_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Synchronous wrapper for async animation application.
     Required for LangGraph compatibility.
     """
-    return asyncio.run(_apply_animation_async(state))
+    return run_sync(_apply_animation_async(state))
+
+
+async def apply_animation_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of apply_animation_node for graphs run with ainvoke().
+    """
+    return await run_async(_apply_animation_async(state))
 
 
 async def _apply_animation_async(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,6 +154,11 @@ async def _apply_animation_async(state: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Updated state with animated_html artifact
     """
+    # The render phase normally applies the animation in its own page
+    if state.get("animation_applied") and state.get("artifacts", {}).get("animated_html"):
+        logger.info("Animation already applied during rendering")
+        return state
+    
     render_html = state.get("artifacts", {}).get("render_html")
     
     if not render_html:
@@ -85,132 +210,45 @@ class AnimationApplicator:
         Returns:
             HTML with animations injected
         """
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-setuid-sandbox"]
+        context = await get_browser_pool().new_context()
+        
+        try:
+            page = await context.new_page()
+            
+            self.logger.info("Loading rendered HTML")
+            # The rendered HTML is static (inline SVG, no scripts), so it is
+            # usable as soon as the DOM is parsed
+            await page.set_content(
+                render_html,
+                wait_until="domcontentloaded",
+                timeout=operation_timeout_ms(CONTENT_LOAD_TIMEOUT_MS)
+            )
+            
+            # Inject JavaScript-based path animation for flowing arrows
+            self.logger.info("Injecting path-based animations", metadata={
+                "duration_seconds": duration
+            })
+            
+            # Define, apply and serialize in one round-trip. The context is
+            # used once, so installing the function as an init script first
+            # would only add a round-trip, and page.content() another.
+            result = await page.evaluate(
+                """(duration) => {
+                    """ + FLOW_ANIMATION_JS + """
+                    return {
+                        ...window.__applyFlowAnimation(duration),
+                        html: '<!DOCTYPE html>' + document.documentElement.outerHTML
+                    };
+                }""",
+                duration
             )
             
-            try:
-                page = await browser.new_page()
-                
-                self.logger.info("Loading rendered HTML")
-                await page.set_content(render_html)
-                
-                # Inject JavaScript-based path animation for flowing arrows
-                self.logger.info("Injecting path-based animations", metadata={
-                    "duration_seconds": duration
-                })
-                
-                result = await page.evaluate("""
-                    (duration) => {
-                        // Find all paths that represent connections/arrows across different diagram types
-                        // Flowcharts: .edgePath path, .flowchart-link
-                        // Sequence diagrams: .messageLine0, .messageLine1, line[class*="messageLine"]
-                        // Class diagrams: .relation line, path[class*="relation"]
-                        // State diagrams: .transition path, path.transition, g.transition path, path[id*="transition"]
-                        // ER diagrams: .er.relationshipLine path
-                        const edgePaths = document.querySelectorAll(`
-                            .edgePath path, 
-                            .flowchart-link,
-                            line[class*="messageLine"],
-                            .messageLine0,
-                            .messageLine1,
-                            .relation line,
-                            path[class*="relation"],
-                            .transition path,
-                            path.transition,
-                            g.transition path,
-                            path[id*="transition"],
-                            path[id*="edge"],
-                            .er.relationshipLine path
-                        `);
-                        
-                        let animatedCount = 0;
-                        
-                        edgePaths.forEach((path, index) => {
-                            // Get the total length of the path/line
-                            let pathLength;
-                            try {
-                                pathLength = path.getTotalLength();
-                            } catch (e) {
-                                // For <line> elements, calculate length manually
-                                if (path.tagName === 'line') {
-                                    const x1 = parseFloat(path.getAttribute('x1') || 0);
-                                    const y1 = parseFloat(path.getAttribute('y1') || 0);
-                                    const x2 = parseFloat(path.getAttribute('x2') || 0);
-                                    const y2 = parseFloat(path.getAttribute('y2') || 0);
-                                    pathLength = Math.sqrt(Math.pow(x2 - x1, 2) + Math.pow(y2 - y1, 2));
-                                } else {
-                                    return; // Skip if we can't get length
-                                }
-                            }
-                            
-                            if (pathLength <= 0) return;
-                            
-                            // Set up stroke-dasharray: 15% of path length for dash, 5% for gap
-                            const dashLength = pathLength * 0.15;
-                            const gapLength = pathLength * 0.05;
-                            path.style.strokeDasharray = `${dashLength} ${gapLength}`;
-                            
-                            // Start with offset at full path length (invisible)
-                            path.style.strokeDashoffset = pathLength;
-                            
-                            // Create unique animation for this path
-                            const animationName = `flow-${index}`;
-                            const styleSheet = document.createElement('style');
-                            styleSheet.textContent = `
-                                @keyframes ${animationName} {
-                                    to {
-                                        stroke-dashoffset: 0;
-                                    }
-                                }
-                            `;
-                            document.head.appendChild(styleSheet);
-                            
-                            // Apply animation with duration matching video length for seamless loop
-                            path.style.animation = `${animationName} ${duration}s linear infinite`;
-                            
-                            animatedCount++;
-                        });
-                        
-                        // Add subtle pulse to nodes with matching duration
-                        const pulseStyle = document.createElement('style');
-                        pulseStyle.textContent = `
-                            @keyframes nodePulse {
-                                0%, 100% {
-                                    opacity: 1;
-                                }
-                                50% {
-                                    opacity: 0.95;
-                                }
-                            }
-                            .node rect, .node circle, .node polygon,
-                            .actor rect, .actor circle,
-                            .classGroup rect {
-                                animation: nodePulse ${duration * 1.5}s ease-in-out infinite;
-                                transform-origin: center;
-                            }
-                        `;
-                        document.head.appendChild(pulseStyle);
-                        
-                        return { 
-                            success: true, 
-                            pathsAnimated: animatedCount,
-                            animationDuration: duration
-                        };
-                    }
-                """, duration)
-                
-                self.logger.info("Path animations injected successfully", metadata={
-                    "paths_animated": result.get("pathsAnimated", 0),
-                    "animation_duration": result.get("animationDuration", duration)
-                })
-                
-                # Get the updated HTML
-                animated_html = await page.content()
-                
-                return animated_html
-                
-            finally:
-                await browser.close()
+            self.logger.info("Path animations injected successfully", metadata={
+                "paths_animated": result.get("pathsAnimated", 0),
+                "animation_duration": result.get("animationDuration", duration)
+            })
+            
+            return result["html"]
+            
+        finally:
+            await close_quietly(context)
@@ -0,0 +1,491 @@
+"""
+Shared Playwright browser for the rendering, animation, and capture nodes.
+
+Cold-starting Chromium dominates the wall time of a pipeline run, so a single
+browser is launched lazily and kept alive across nodes and invocations. Each
+job gets its own BrowserContext for isolation; contexts are far cheaper to
+create than browsers.
+
+CRITICAL FEATURES:
+- One Playwright driver and one Chromium process per Python process
+- Fresh BrowserContext per job
+- Warm queue of pre-loaded pages, reused after a reset and refilled in
+  the background
+- Long-lived event loop on a background thread so Playwright objects
+  survive between nodes
+- Background prewarm so the browser launches while the LLM phases run
+- Idempotent shutdown of browser and loop, registered with atexit
+"""
+
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Page,
+    Playwright,
+    Route,
+    async_playwright,
+)
+
+from ..core.config import get_config
+from ..utils.logger import get_logger
+
+logger = get_logger("browser_pool")
+
+T = TypeVar("T")
+
+# Chromium launch arguments shared by every node.
+# GPU and accelerated canvas are deliberately left enabled: the capture is a
+# compositor-driven CSS animation, and headless Chromium falls back to
+# SwiftShader on its own when no GPU is present.
+CHROMIUM_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    # Containers default /dev/shm to 64 MB, too small for wide diagram pages;
+    # use regular temp files for shared memory instead of crashing renderers
+    "--disable-dev-shm-usage",
+    # Subsystems a headless diagram renderer never uses; skipping them makes
+    # startup faster and each renderer process lighter
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-breakpad",
+    "--disable-client-side-phishing-detection",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-domain-reliability",
+    "--disable-sync",
+    "--disable-features=TranslateUI",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--mute-audio",
+    # Keep animation timers running at full rate and keep scrollbars out of
+    # captured frames. Concurrent captures all count as background pages,
+    # so renderer backgrounding would deprioritize them too.
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-ipc-flooding-protection",
+    "--hide-scrollbars",
+]
+
+# Per-operation timeouts in milliseconds at the default BROWSER_TIMEOUT_MS.
+# They let fast operations fail fast instead of spending the whole budget on
+# a hung render, and scale with BROWSER_TIMEOUT_MS so raising it for slow
+# hosts lengthens every wait.
+BASE_BROWSER_TIMEOUT_MS = 30000
+CONTENT_LOAD_TIMEOUT_MS = 10000
+SCRIPT_LOAD_TIMEOUT_MS = 20000
+RENDER_TIMEOUT_MS = 15000
+FIRST_FRAME_TIMEOUT_MS = 5000
+
+# Viewport for pages that lay out a diagram before its size is known. The
+# width is what matters: diagrams that keep Mermaid's useMaxWidth scale to
+# it, so it must stay wide. Height never constrains layout (tall diagrams
+# overflow and are measured by bounding box), so it is kept small to save
+# compositor memory.
+LAYOUT_VIEWPORT = {"width": 4000, "height": 1000}
+
+# Requests a diagram page never needs. Images and fonts are left alone since
+# diagrams may embed them through HTML labels.
+BLOCKED_RESOURCE_TYPES = frozenset({"media", "texttrack", "manifest", "eventsource", "websocket"})
+BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net")
+
+# Upper bound on any single teardown step, in seconds
+CLOSE_TIMEOUT_S = 5.0
+
+# Upper bound on live contexts created through the pool, so a burst of
+# concurrent jobs queues up instead of exhausting browser memory
+MAX_CONTEXTS = 16
+
+# Number of pre-loaded pages kept ready per warm queue
+WARM_PAGES = 2
+
+PagePreparer = Callable[[Page], Awaitable[None]]
+
+
+async def close_quietly(
+    closeable: Any,
+    timeout: float = CLOSE_TIMEOUT_S,
+    what: str = "context"
+) -> None:
+    """
+    Close a Playwright object without letting teardown stall or mask errors.
+
+    Used on cleanup paths, where a hung close would gate the whole pipeline
+    and an exception would hide the error that triggered the cleanup.
+
+    Args:
+        closeable: Context, page, or browser to close
+        timeout: Seconds to wait before giving up
+        what: Name used in the warning log
+    """
+    try:
+        await asyncio.wait_for(closeable.close(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Timed out closing {what}", metadata={"timeout_seconds": timeout})
+    except Exception as e:
+        logger.warning(f"Failed to close {what}", metadata={"error": str(e)})
+
+
+async def _abort_nonessential(route: Route) -> None:
+    """Abort requests that cannot affect the rendered diagram."""
+    request = route.request
+    host = urlsplit(request.url).hostname or ""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or host.endswith(BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.fallback()
+
+
+class BrowserPool:
+    """
+    Owns the Playwright driver and the Chromium browser shared by all nodes.
+
+    The browser is launched on first use and relaunched if it disconnects.
+    Callers create and close their own contexts; only shutdown closes the
+    browser itself.
+    """
+
+    def __init__(self):
+        """Initialize an empty pool; nothing is launched until first use."""
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._lock = asyncio.Lock()
+        self._context_slots = asyncio.Semaphore(MAX_CONTEXTS)
+        self._warm: Dict[str, asyncio.Queue] = {}
+        self._refills: Dict[str, asyncio.Task] = {}
+
+    async def get_browser(self) -> Browser:
+        """
+        Get the shared browser, launching it if necessary.
+
+        Returns:
+            Browser: Connected Chromium browser
+        """
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True,
+                    args=CHROMIUM_ARGS,
+                )
+                logger.info("Launched shared Chromium browser")
+            return self._browser
+
+    async def new_context(self, **kwargs: Any) -> BrowserContext:
+        """
+        Create a fresh, isolated context on the shared browser.
+
+        Waits while MAX_CONTEXTS pool contexts are open; the slot is released
+        when the context closes, however that happens. Requests that cannot
+        affect a diagram (media, analytics) are aborted.
+
+        Args:
+            **kwargs: Options forwarded to Browser.new_context()
+
+        Returns:
+            BrowserContext: New context; the caller is responsible for closing it
+        """
+        await self._context_slots.acquire()
+        try:
+            browser = await self.get_browser()
+            context = await browser.new_context(**kwargs)
+        except BaseException:
+            self._context_slots.release()
+            raise
+        context.once("close", lambda _: self._context_slots.release())
+        try:
+            await context.route("**/*", _abort_nonessential)
+        except BaseException:
+            # Closing also frees the slot through the close handler
+            await close_quietly(context)
+            raise
+        return context
+
+    async def acquire_page(
+        self,
+        key: str,
+        prepare: PagePreparer,
+        init_script: Optional[str] = None,
+        **context_kwargs: Any
+    ) -> Tuple[BrowserContext, Page]:
+        """
+        Take a page that has already been through `prepare`.
+
+        Pages are kept warm per `key`: one is popped from the queue if
+        available (otherwise prepared on the spot) and the queue is refilled
+        in the background, so the next caller skips the setup cost.
+
+        Args:
+            key: Name of the warm queue; all callers of a key must pass the
+                 same `prepare` and context options
+            prepare: Coroutine that brings a fresh page to its ready state
+            init_script: Script installed on the context before the page exists
+            **context_kwargs: Options forwarded to Browser.new_context()
+
+        Returns:
+            Tuple of (context, page); the caller owns and must close the context
+        """
+        queue = self._warm.setdefault(key, asyncio.Queue())
+
+        warm = None
+        while not queue.empty():
+            context, page = queue.get_nowait()
+            if not page.is_closed():
+                warm = (context, page)
+                break
+
+        if warm is None:
+            warm = await self._prepare_page(prepare, init_script, context_kwargs)
+
+        refill = self._refills.get(key)
+        if refill is None or refill.done():
+            self._refills[key] = asyncio.create_task(
+                self._refill(queue, prepare, init_script, context_kwargs)
+            )
+
+        return warm
+
+    async def release_page(
+        self,
+        key: str,
+        context: BrowserContext,
+        page: Page,
+        reset: PagePreparer
+    ) -> None:
+        """
+        Give a page from acquire_page back to its warm queue for reuse.
+
+        The page is reset and queued if the queue has room; otherwise, or if
+        the reset fails, its context is closed.
+
+        Args:
+            key: Warm queue the page was acquired from
+            context: The page's context
+            page: Page to return
+            reset: Coroutine that brings a used page back to its ready state
+        """
+        queue = self._warm.get(key)
+        if queue is None or queue.qsize() >= WARM_PAGES or page.is_closed():
+            await close_quietly(context)
+            return
+
+        try:
+            await asyncio.wait_for(reset(page), timeout=CLOSE_TIMEOUT_S)
+        except Exception as e:
+            logger.warning("Failed to reset page for reuse", metadata={"error": repr(e)})
+            await close_quietly(context)
+            return
+
+        queue.put_nowait((context, page))
+
+    async def _prepare_page(
+        self,
+        prepare: PagePreparer,
+        init_script: Optional[str],
+        context_kwargs: Dict[str, Any]
+    ) -> Tuple[BrowserContext, Page]:
+        """Create a context and page and run `prepare` on it."""
+        context = await self.new_context(**context_kwargs)
+        try:
+            # Context-level, so it is already in place on the page's first document
+            if init_script is not None:
+                await context.add_init_script(script=init_script)
+            page = await context.new_page()
+            await prepare(page)
+        except BaseException:
+            await close_quietly(context)
+            raise
+        return context, page
+
+    async def _refill(
+        self,
+        queue: asyncio.Queue,
+        prepare: PagePreparer,
+        init_script: Optional[str],
+        context_kwargs: Dict[str, Any]
+    ) -> None:
+        """Top a warm queue back up to WARM_PAGES prepared pages."""
+        try:
+            while queue.qsize() < WARM_PAGES:
+                queue.put_nowait(
+                    await self._prepare_page(prepare, init_script, context_kwargs)
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Warming is best effort; acquire_page falls back to a cold page
+            logger.warning("Failed to warm page", metadata={"error": str(e)})
+
+    async def close(self) -> None:
+        """Close warm pages, the shared browser, and the Playwright driver."""
+        refills = list(self._refills.values())
+        for task in refills:
+            task.cancel()
+        await asyncio.gather(*refills, return_exceptions=True)
+        self._refills.clear()
+        for queue in self._warm.values():
+            while not queue.empty():
+                context, _ = queue.get_nowait()
+                await close_quietly(context)
+        self._warm.clear()
+
+        async with self._lock:
+            if self._browser is not None:
+                await close_quietly(self._browser, what="browser")
+                self._browser = None
+            if self._playwright is not None:
+                try:
+                    await asyncio.wait_for(self._playwright.stop(), timeout=CLOSE_TIMEOUT_S)
+                except Exception as e:
+                    logger.warning("Failed to stop Playwright", metadata={"error": repr(e)})
+                self._playwright = None
+
+
+# Global pool, event loop, and loop thread instances
+# All are created on first use
+_pool: Optional[BrowserPool] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def operation_timeout_ms(base_ms: int) -> int:
+    """
+    Get the timeout for one browser operation.
+
+    Args:
+        base_ms: Timeout for this kind of operation at the default
+            browser timeout
+
+    Returns:
+        int: base_ms scaled by the configured browser timeout
+    """
+    return base_ms * get_config().browser_timeout_ms // BASE_BROWSER_TIMEOUT_MS
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Get the global browser pool instance.
+
+    Returns:
+        BrowserPool: The process-wide browser pool
+    """
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start the engine event loop on a daemon thread if it isn't running."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever,
+                name="engine-event-loop",
+                daemon=True,
+            )
+            _loop_thread.start()
+        return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine on the long-lived engine event loop.
+
+    Playwright objects are bound to the loop that created them, so the
+    synchronous LangGraph node wrappers must all share one loop instead of
+    calling asyncio.run() (which creates and closes a new loop every time).
+    The loop runs forever on its own thread, so background work such as
+    warm-page refills keeps progressing between node calls.
+
+    Args:
+        coro: Coroutine to run to completion
+
+    Returns:
+        The coroutine's result
+    """
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the engine event loop")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+async def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Await a coroutine on the engine event loop from any event loop.
+
+    The async counterpart of run_sync() for hosts that drive the graph with
+    ainvoke(): the caller's loop stays free while the engine loop does the
+    browser work, and no nested loop is ever needed.
+
+    Args:
+        coro: Coroutine to run to completion
+
+    Returns:
+        The coroutine's result
+    """
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def prewarm() -> None:
+    """
+    Start the Playwright driver and launch the shared browser in the background.
+
+    Returns immediately. Calling this when a pipeline starts overlaps the
+    driver spawn and Chromium launch with the LLM and validation phases, so
+    the first render finds the browser already up. A failed launch is only
+    logged; the next real use retries it.
+    """
+    def log_failure(future: Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Browser prewarm failed", metadata={
+                "error": repr(future.exception())
+            })
+
+    future = asyncio.run_coroutine_threadsafe(get_browser_pool().get_browser(), _get_loop())
+    future.add_done_callback(log_failure)
+
+
+def shutdown() -> None:
+    """
+    Close the shared browser and stop the engine event loop.
+
+    Registered with atexit, and safe to call earlier (e.g. from a long-lived
+    host that wants to release Chromium) or more than once. A later run_sync()
+    starts a fresh loop and the pool relaunches the browser on demand.
+    """
+    global _pool, _loop, _loop_thread
+    with _loop_lock:
+        loop, thread, pool = _loop, _loop_thread, _pool
+        _loop = _loop_thread = _pool = None
+
+    if loop is None or loop.is_closed():
+        return
+    try:
+        if pool is not None:
+            asyncio.run_coroutine_threadsafe(pool.close(), loop).result(timeout=10)
+    except Exception as e:
+        logger.warning("Browser pool did not close cleanly", metadata={"error": repr(e)})
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+
+
+atexit.register(shutdown)
@@ -3,34 +3,162 @@ Capture Controller for Mermaid.js Animated Diagrams
 Records video of animated SVG diagrams
 """
 
-from playwright.async_api import async_playwright
 from pathlib import Path
+from playwright.async_api import Browser, BrowserContext, Page
+from .browser_pool import (
+    CONTENT_LOAD_TIMEOUT_MS,
+    FIRST_FRAME_TIMEOUT_MS,
+    LAYOUT_VIEWPORT,
+    close_quietly,
+    get_browser_pool,
+    operation_timeout_ms,
+    run_async,
+    run_sync,
+)
+from .ffmpeg_processor import FFmpegProcessor
 from ..core.config import get_config
 from ..utils.logger import get_logger
-from typing import Dict, Any
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 import asyncio
-import nest_asyncio
-
-# Allow nested event loops for LangGraph compatibility
-nest_asyncio.apply()
+import base64
+import hashlib
+import time
+import uuid
 
 logger = get_logger("capture_controller")
 
+# Screencast capture and muxing are CPU heavy; bound how many run at once
+MAX_CONCURRENT_CAPTURES = 4
+
+# Number of SVG measurements remembered, keyed by a digest of the HTML.
+# Recapturing the same diagram then skips the throwaway measurement page.
+MEASUREMENT_CACHE_ENTRIES = 64
+_measurements: "OrderedDict[bytes, Dict[str, int]]" = OrderedDict()
+
+
+# CSS that centers the diagram in the exact-fit capture viewport
+CAPTURE_STYLE = """
+<style>
+    body {
+        margin: 0;
+        padding: 0;
+        display: flex;
+        justify-content: center;
+        align-items: center;
+        min-height: 100vh;
+        background: white;
+    }
+</style>
+"""
+
+
+def _with_capture_style(html: str) -> str:
+    """
+    Add CAPTURE_STYLE to the end of the document head.
+    
+    Placed last so it overrides the renderer's own body styles.
+    
+    Args:
+        html: Animated HTML document
+        
+    Returns:
+        The HTML with the capture style injected
+    """
+    head_end = html.find("</head>")
+    if head_end == -1:
+        return CAPTURE_STYLE + html
+    return html[:head_end] + CAPTURE_STYLE + html[head_end:]
+
+
+def _resample_frames(
+    frames: List[Tuple[float, bytes]],
+    fps: int,
+    duration: float
+) -> List[bytes]:
+    """
+    Resample timestamped screencast frames onto a constant frame-rate grid.
+    
+    Each output slot repeats the latest frame shown at that instant, which is
+    exactly what was on screen since screencast frames are only sent on change.
+    
+    Args:
+        frames: (timestamp_seconds, image_bytes) pairs in arrival order
+        fps: Output frame rate
+        duration: Output length in seconds
+        
+    Returns:
+        List of image bytes, one per output frame
+    """
+    if not frames:
+        raise RuntimeError("Screencast produced no frames")
+    
+    start = frames[0][0]
+    resampled = []
+    index = 0
+    for slot in range(round(duration * fps)):
+        at = start + slot / fps
+        while index + 1 < len(frames) and frames[index + 1][0] <= at:
+            index += 1
+        resampled.append(frames[index][1])
+    
+    return resampled
+
 
 def capture_video_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Synchronous wrapper for async video capture.
     Required for LangGraph compatibility.
     """
-    return asyncio.run(_capture_video_async(state))
+    return run_sync(_capture_video_async(state))
+
+
+async def capture_video_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of capture_video_node for graphs run with ainvoke().
+    """
+    return await run_async(_capture_video_async(state))
 
 
-async def _capture_video_async(state: Dict[str, Any]) -> Dict[str, Any]:
+def capture_videos(states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Capture several diagrams concurrently on the shared browser.
+    
+    Each capture runs in its own context, so they are isolated from each
+    other while sharing one Chromium process.
+    
+    Args:
+        states: Graph states each containing an animated_html artifact
+        
+    Returns:
+        The updated states, in the same order
+    """
+    return run_sync(_capture_videos_async(states))
+
+
+async def _capture_videos_async(states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run captures concurrently, at most MAX_CONCURRENT_CAPTURES at a time."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CAPTURES)
+    
+    async def capture_one(state: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await _capture_video_async(state)
+    
+    return await asyncio.gather(*(capture_one(state) for state in states))
+
+
+async def _capture_video_async(
+    state: Dict[str, Any],
+    browser: Optional[Browser] = None
+) -> Dict[str, Any]:
     """
     Capture video of animated Mermaid diagram.
     
+    Safe to run concurrently: all per-capture state lives in its own context.
+    
     Args:
         state: Graph state containing animated_html artifact
+        browser: Browser to capture with (default: the shared pool browser)
         
     Returns:
         Updated state with video_path artifact
@@ -42,7 +170,7 @@ async def _capture_video_async(state: Dict[str, Any]) -> Dict[str, Any]:
     
     logger.info("Starting video capture")
     
-    controller = CaptureController()
+    controller = CaptureController(browser)
     try:
         video_path = await controller.capture(animated_html, state)
         
@@ -66,17 +194,25 @@ async def _capture_video_async(state: Dict[str, Any]) -> Dict[str, Any]:
 class CaptureController:
     """Captures video of animated Mermaid diagrams"""
     
-    def __init__(self):
+    def __init__(self, browser: Optional[Browser] = None):
+        """
+        Initialize the controller.
+        
+        Args:
+            browser: Browser to create capture contexts on (default: the
+                     shared pool browser). The controller never closes it.
+        """
         self.config = get_config()
         self.logger = get_logger("capture_controller")
+        self.browser = browser
     
     async def capture(self, animated_html: str, state: Dict[str, Any]) -> Path:
         """
         Capture video of animated diagram with smart viewport sizing.
         
         Uses a two-phase approach:
-        1. Measure: Detect actual SVG dimensions
-        2. Record: Create video with exact fit (no excess white space)
+        1. Measure: Detect actual SVG dimensions (reused from the render phase when available)
+        2. Record: Screencast one cycle with exact fit (no excess white space)
         
         Args:
             animated_html: HTML with animated SVG
@@ -93,10 +229,11 @@ class CaptureController:
         output_dir = Path("./output")
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Generate dynamic video filename with timestamp
+        # Generate dynamic video filename with timestamp; the random suffix
+        # keeps concurrent captures from colliding within the same millisecond
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:19]  # Up to milliseconds
-        video_path = output_dir / f"mermaid_{timestamp}.webm"
+        video_path = output_dir / f"mermaid_{timestamp}_{uuid.uuid4().hex[:8]}.mkv"
         
         self.logger.info("Initializing smart viewport capture", metadata={
             "duration": duration,
@@ -104,137 +241,271 @@ class CaptureController:
             "output": str(video_path)
         })
         
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-setuid-sandbox"]
+        context = None
+        
+        try:
+            # ============================================================
+            # PHASE 1: MEASUREMENT (Probe)
+            # ============================================================
+            # The render phase already measured the SVG at the same viewport;
+            # only load the page a second time when that measurement is missing
+            bbox = state.get("artifacts", {}).get("svg_dimensions")
+            
+            if bbox:
+                self.logger.info("Phase 1: Reusing diagram dimensions from render phase")
+            else:
+                self.logger.info("Phase 1: Measuring diagram dimensions")
+                bbox = await self._measure(animated_html)
+            
+            if not bbox or bbox['width'] <= 0 or bbox['height'] <= 0:
+                raise RuntimeError(f"Invalid SVG dimensions detected: {bbox}")
+            
+            # Calculate final dimensions with padding
+            padding = 40
+            raw_width = bbox['width'] + padding
+            raw_height = bbox['height'] + padding
+            
+            # Ensure dimensions are even (FFmpeg requirement)
+            final_width = raw_width if raw_width % 2 == 0 else raw_width + 1
+            final_height = raw_height if raw_height % 2 == 0 else raw_height + 1
+            
+            self.logger.info("Diagram dimensions measured", metadata={
+                "svg_width": bbox['width'],
+                "svg_height": bbox['height'],
+                "final_width": final_width,
+                "final_height": final_height,
+                "padding": padding
+            })
+            
+            # ============================================================
+            # PHASE 2: RECORDING (Action)
+            # ============================================================
+            self.logger.info("Phase 2: Recording with optimized viewport")
+            
+            # Plain context: frames come from a CDP screencast, so there is no
+            # Playwright video to finalize when the context closes
+            context = await self._new_context(
+                viewport={"width": final_width, "height": final_height}
             )
             
+            page = await context.new_page()
+            
+            # Load the animated HTML with the centering CSS already in it,
+            # instead of a separate add_style_tag round-trip after loading.
+            # The HTML is static (inline SVG, no scripts), so the diagram is
+            # in the DOM once it is parsed; no separate selector wait needed.
+            await page.set_content(
+                _with_capture_style(animated_html),
+                wait_until="domcontentloaded",
+                timeout=operation_timeout_ms(CONTENT_LOAD_TIMEOUT_MS)
+            )
+            
+            self.logger.info("Starting screencast", metadata={
+                "duration_seconds": duration,
+                "viewport": f"{final_width}x{final_height}"
+            })
+            
+            # Large diagrams are downscaled by Chromium itself (aspect ratio
+            # kept) so per-frame bytes stay bounded by the configured viewport
+            frames = await self._screencast(
+                context,
+                page,
+                duration,
+                min(final_width, self.config.viewport_width),
+                min(final_height, self.config.viewport_height)
+            )
+            
+            self.logger.info("Screencast complete", metadata={
+                "frames_received": len(frames)
+            })
+            
+            # The recording starts on a visible diagram and is exactly one
+            # cycle long, so the transcoder has nothing to trim
+            artifacts = state.setdefault("artifacts", {})
+            artifacts["capture_offset"] = 0.0
+            artifacts["capture_duration"] = duration
+            
+            # Encoding is CPU-bound subprocess work; keep it off the event loop
+            await asyncio.to_thread(
+                FFmpegProcessor().mux_frames,
+                _resample_frames(frames, fps, duration),
+                fps,
+                video_path
+            )
+            
+            self.logger.info("Video saved with smart viewport", metadata={
+                "path": str(video_path),
+                "size_bytes": video_path.stat().st_size,
+                "dimensions": f"{final_width}x{final_height}"
+            })
+            
+            return video_path
+            
+        finally:
+            # Close only our context; the shared browser stays up for the next job
+            if context is not None:
+                await close_quietly(context)
+
+    async def _screencast(
+        self,
+        context: BrowserContext,
+        page: Page,
+        duration: float,
+        width: int,
+        height: int
+    ) -> List[Tuple[float, bytes]]:
+        """
+        Record one animation cycle with CDP Page.startScreencast.
+        
+        Chromium only emits a frame when the page repaints, so frames carry
+        their own timestamps and are resampled to a constant rate afterwards.
+        Completion is driven by those timestamps too: recording stops as soon
+        as a frame at or past the end of the cycle arrives, with no polling.
+        
+        Args:
+            context: Context owning the page
+            page: Page showing the animated diagram
+            duration: Seconds to record
+            width: Maximum frame width
+            height: Maximum frame height
+            
+        Returns:
+            List of (timestamp_seconds, png_bytes) in arrival order
+        """
+        cdp = await context.new_cdp_session(page)
+        frames: List[Tuple[float, bytes]] = []
+        first_frame = asyncio.Event()
+        cycle_done = asyncio.Event()
+        
+        async def on_frame(params: Dict[str, Any]) -> None:
+            # Frames still in flight after the cycle are neither kept nor
+            # acknowledged; the session may already be detached by then
+            if cycle_done.is_set():
+                return
+            timestamp = params.get("metadata", {}).get("timestamp", time.time())
+            frames.append((timestamp, base64.b64decode(params["data"])))
+            first_frame.set()
+            if timestamp - frames[0][0] >= duration:
+                cycle_done.set()
+                return
+            # Chromium stops sending frames until the previous one is acknowledged
             try:
-                # ============================================================
-                # PHASE 1: MEASUREMENT (Probe)
-                # ============================================================
-                self.logger.info("Phase 1: Measuring diagram dimensions")
-                
-                # Create temporary context for measurement (no recording)
-                # Use a very wide viewport to allow LR diagrams to render at full resolution
-                measure_context = await browser.new_context(
-                    viewport={"width": 4000, "height": 3000}  # Wide viewport for accurate measurement
-                )
-                measure_page = await measure_context.new_page()
-                
-                # Load HTML and wait for SVG
-                await measure_page.set_content(animated_html)
-                await measure_page.wait_for_selector("svg", timeout=5000)
-                
-                # Measure the SVG bounding box
-                bbox = await measure_page.evaluate("""
-                    () => {
-                        const svg = document.querySelector('svg');
-                        if (!svg) return null;
-                        const rect = svg.getBoundingClientRect();
-                        return { 
-                            width: Math.ceil(rect.width), 
-                            height: Math.ceil(rect.height) 
-                        };
-                    }
-                """)
-                
-                # Close measurement context
-                await measure_context.close()
-                
-                if not bbox or bbox['width'] <= 0 or bbox['height'] <= 0:
-                    raise RuntimeError(f"Invalid SVG dimensions detected: {bbox}")
-                
-                # Calculate final dimensions with padding
-                padding = 40
-                raw_width = bbox['width'] + padding
-                raw_height = bbox['height'] + padding
-                
-                # Ensure dimensions are even (FFmpeg requirement)
-                final_width = raw_width if raw_width % 2 == 0 else raw_width + 1
-                final_height = raw_height if raw_height % 2 == 0 else raw_height + 1
-                
-                self.logger.info("Diagram dimensions measured", metadata={
-                    "svg_width": bbox['width'],
-                    "svg_height": bbox['height'],
-                    "final_width": final_width,
-                    "final_height": final_height,
-                    "padding": padding
-                })
-                
-                # ============================================================
-                # PHASE 2: RECORDING (Action)
-                # ============================================================
-                self.logger.info("Phase 2: Recording with optimized viewport")
-                
-                # Create context with exact dimensions for recording
-                context = await browser.new_context(
-                    viewport={"width": final_width, "height": final_height},
-                    record_video_dir=str(output_dir),
-                    record_video_size={"width": final_width, "height": final_height}
+                await cdp.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+            except Exception:
+                # Recording ended (timeout or teardown) while this ack was pending
+                pass
+        
+        cdp.on("Page.screencastFrame", on_frame)
+        
+        try:
+            # PNG keeps the flat diagram colors exact for palette generation
+            await cdp.send("Page.startScreencast", {
+                "format": "png",
+                "maxWidth": width,
+                "maxHeight": height,
+                "everyNthFrame": 1
+            })
+            try:
+                await asyncio.wait_for(
+                    first_frame.wait(),
+                    timeout=operation_timeout_ms(FIRST_FRAME_TIMEOUT_MS) / 1000
                 )
-                
-                page = await context.new_page()
-                
-                # Load the animated HTML
-                await page.set_content(animated_html)
-                
-                # Wait for SVG to be present
-                await page.wait_for_selector("svg", timeout=5000)
-                
-                # Inject CSS to center the content
-                await page.add_style_tag(content="""
-                    body {
-                        margin: 0;
-                        padding: 0;
-                        display: flex;
-                        justify-content: center;
-                        align-items: center;
-                        min-height: 100vh;
-                        background: white;
-                    }
-                """)
-                
-                self.logger.info("Starting video recording", metadata={
-                    "duration_seconds": duration,
-                    "buffer_seconds": 2.0,
-                    "viewport": f"{final_width}x{final_height}"
-                })
-                
-                # Record longer than needed to create buffers at start and end
-                # Start buffer (1.0s): Hides loading/blank frame
-                # End buffer (1.0s): Hides context closing
-                # We will trim this in FFmpeg later
-                await asyncio.sleep(duration + 2.0)
-                
-                self.logger.info("Video recording complete")
-                
-                # IMPORTANT: Close context first to stop recording
-                # This prevents capturing blank frames when the page closes
-                await context.close()
-                
-                # Get the recorded video path
-                # Playwright saves it with a unique name based on page ID
-                # We need to find the latest file created in the output dir
-                video_files = list(output_dir.glob("*.webm"))
-                if not video_files:
-                    raise RuntimeError("No video file was created")
-                
-                # Find the most recently created video file that matches Playwright's random naming
-                # Playwright generates random names, so we assume the newest one is ours
-                latest_video = max(video_files, key=lambda p: p.stat().st_mtime)
-                
-                # Rename to our desired dynamic filename
-                latest_video.rename(video_path)
-                
-                self.logger.info("Video saved with smart viewport", metadata={
-                    "path": str(video_path),
-                    "size_bytes": video_path.stat().st_size,
-                    "dimensions": f"{final_width}x{final_height}"
-                })
-                
-                return video_path
-                
-            finally:
-                await browser.close()
+            except asyncio.TimeoutError:
+                raise RuntimeError(
+                    "No screencast frame arrived; the page never painted"
+                ) from None
+            
+            try:
+                await asyncio.wait_for(cycle_done.wait(), timeout=duration + 1)
+            except asyncio.TimeoutError:
+                # The page stopped repainting before the cycle ended; the last
+                # frame is what stayed on screen, and resampling holds it
+                self.logger.info("Screencast went idle before the cycle ended")
+            
+            await cdp.send("Page.stopScreencast")
+        finally:
+            await cdp.detach()
+        
+        return frames
+
+    async def _new_context(self, **kwargs: Any) -> BrowserContext:
+        """
+        Create a context on the injected browser, or through the shared pool.
+        
+        Args:
+            **kwargs: Options forwarded to Browser.new_context()
+            
+        Returns:
+            BrowserContext: New context; the caller is responsible for closing it
+        """
+        if self.browser is not None:
+            return await self.browser.new_context(**kwargs)
+        return await get_browser_pool().new_context(**kwargs)
+
+    async def _measure(self, animated_html: str) -> Optional[Dict[str, int]]:
+        """
+        Measure the SVG bounding box in a throwaway, non-recording context.
+        
+        Results are cached per HTML document, so recapturing an unchanged
+        diagram skips the measurement page entirely.
+        
+        Args:
+            animated_html: HTML with animated SVG
+            
+        Returns:
+            dict with "width" and "height" in CSS pixels, or None if no SVG found
+        """
+        # The layout depends only on the HTML and the fixed layout viewport
+        key = hashlib.blake2b(animated_html.encode(), digest_size=16).digest()
+        cached = _measurements.get(key)
+        if cached is not None:
+            _measurements.move_to_end(key)
+            return cached
+        
+        bbox = await self._measure_page(animated_html)
+        if bbox is not None:
+            _measurements[key] = bbox
+            while len(_measurements) > MEASUREMENT_CACHE_ENTRIES:
+                _measurements.popitem(last=False)
+        return bbox
+
+    async def _measure_page(self, animated_html: str) -> Optional[Dict[str, int]]:
+        """
+        Load the HTML in a throwaway context and read its SVG bounding box.
+        
+        Args:
+            animated_html: HTML with animated SVG
+            
+        Returns:
+            dict with "width" and "height" in CSS pixels, or None if no SVG found
+        """
+        # Use a very wide viewport to allow LR diagrams to render at full resolution
+        measure_context = await self._new_context(
+            viewport=LAYOUT_VIEWPORT  # Same layout as the render phase
+        )
+        
+        try:
+            measure_page = await measure_context.new_page()
+            
+            # Load HTML; being static, its SVG is present once the DOM is parsed
+            await measure_page.set_content(
+                animated_html,
+                wait_until="domcontentloaded",
+                timeout=operation_timeout_ms(CONTENT_LOAD_TIMEOUT_MS)
+            )
+            
+            # Measure the SVG bounding box (null if there is no SVG)
+            return await measure_page.evaluate("""
+                () => {
+                    const svg = document.querySelector('svg');
+                    if (!svg) return null;
+                    const rect = svg.getBoundingClientRect();
+                    return { 
+                        width: Math.ceil(rect.width), 
+                        height: Math.ceil(rect.height) 
+                    };
+                }
+            """)
+            
+        finally:
+            await close_quietly(measure_context)
@@ -9,11 +9,15 @@ CRITICAL FEATURES:
 - Filter complex for optimal color mapping
 - Seamless looping support
 - Configurable scaling and frame rate
+- Lossless muxing of captured screencast frames
+- Input metadata parsed from the encode's own stderr (no extra ffprobe)
 """
 
-import subprocess
+import os
+import re
+from fractions import Fraction
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import ffmpeg
 
@@ -24,6 +28,53 @@ from ..utils.logger import get_logger
 
 logger = get_logger("ffmpeg_processor")
 
+# Threads for the filtergraph (lanczos scaling and palette mapping split
+# across rows); FFmpeg defaults the filter_complex to a single thread
+FILTER_THREADS = os.cpu_count() or 1
+
+# Patterns for the input description FFmpeg prints to stderr, e.g.
+#   Duration: 00:00:05.00, start: 0.000000, bitrate: N/A
+#   Stream #0:0: Video: png, rgba(pc), 1280x720, 30 fps, 30 tbr, 1k tbn
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+_VIDEO_STREAM_RE = re.compile(r"Stream #\d+:\d+.*?: Video: .*")
+_SIZE_RE = re.compile(r"\b(\d{2,5})x(\d{2,5})\b")
+_FPS_RE = re.compile(r"\b(\d+(?:\.\d+)?) (?:fps|tbr)\b")
+
+
+def _parse_input_info(stderr: str) -> Dict[str, Any]:
+    """
+    Extract input video metadata from FFmpeg's stderr.
+    
+    Only the "Input #0" section is read, so output stream descriptions are
+    never mistaken for the input's.
+    
+    Args:
+        stderr: Decoded stderr of an ffmpeg run
+        
+    Returns:
+        dict: Video metadata (duration, width, height, fps); fields FFmpeg
+              did not report are 0
+    """
+    section = stderr.split("Input #0", 1)[-1].split("Output #0", 1)[0]
+    
+    info: Dict[str, Any] = {"duration": 0.0, "width": 0, "height": 0, "fps": 0.0}
+    
+    duration = _DURATION_RE.search(section)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    stream = _VIDEO_STREAM_RE.search(section)
+    if stream:
+        size = _SIZE_RE.search(stream.group(0))
+        if size:
+            info["width"], info["height"] = int(size.group(1)), int(size.group(2))
+        fps = _FPS_RE.search(stream.group(0))
+        if fps:
+            info["fps"] = float(fps.group(1))
+    
+    return info
+
 
 class FFmpegProcessor:
     """
@@ -44,7 +95,9 @@ class FFmpegProcessor:
         output_path: Path,
         fps: Optional[int] = None,
         scale_width: Optional[int] = None,  # None = preserve original resolution
-    ) -> None:
+        start_offset: float = 1.0,
+        duration: Optional[float] = None,
+    ) -> Dict[str, Any]:
         """
         Convert video to optimized GIF using palette-based encoding.
         
@@ -58,6 +111,13 @@ class FFmpegProcessor:
             output_path: Path to output GIF file
             fps: Frame rate for output GIF (default: from config)
             scale_width: Width for output GIF (None = preserve original, default: None)
+            start_offset: Seconds of lead-in to skip at the start of the video
+            duration: Seconds of video to keep (default: from config)
+            
+        Returns:
+            dict: Input video metadata (duration, width, height, fps), read
+                  from the encode's stderr instead of a separate ffprobe run,
+                  plus gif_size_bytes from the output validation
             
         Raises:
             FFmpegError: If FFmpeg processing fails
@@ -70,6 +130,9 @@ class FFmpegProcessor:
         if fps is None:
             fps = self.config.default_fps
         
+        if duration is None:
+            duration = self.config.default_animation_duration
+        
         try:
             # Ensure output directory exists
             output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -80,22 +143,30 @@ class FFmpegProcessor:
             # 2. Generate palette: [a] palettegen [p]
             # 3. Apply palette: [b][p] paletteuse
             
-            # Skip first 1.0 second (loading buffer) and take duration length
-            # This ensures we get a clean loop without blank frames
+            # Skip the lead-in before the diagram was visible and take exactly
+            # one animation cycle, so the GIF loops without blank frames
             input_stream = ffmpeg.input(
                 str(video_path),
-                ss=1.0,
-                t=self.config.default_animation_duration  # 5.0s by default
+                ss=start_offset,
+                t=duration
             )
             
             # Split the video stream into two branches with labels
             split_outputs = input_stream.video.split()
             
-            # Branch 1: Generate high-quality palette with more colors
+            # Branch 1: Generate the palette from the first frame only.
+            # The animation only moves dashes along edges, so every frame uses
+            # the same flat diagram colors; trimming to one frame also lets
+            # palettegen finish immediately instead of buffering the whole
+            # clip in the split. Diagrams rarely need more than 128 colors.
             palette = split_outputs[0].filter(
+                "trim",
+                end_frame=1
+            ).filter(
                 "palettegen",
-                max_colors=256,
-                stats_mode="full"  # Changed from 'diff' for better quality
+                max_colors=128,
+                reserve_transparent=0,
+                stats_mode="full"
             )
             
             # Branch 2: Scale only if scale_width is specified
@@ -110,12 +181,14 @@ class FFmpegProcessor:
                 # Preserve original resolution for best quality
                 scaled = split_outputs[1]
             
-            # Apply palette with optimized dithering for all diagram orientations
-            # floyd_steinberg provides excellent quality for both wide and tall diagrams
+            # Apply palette with ordered dithering: flat diagram colors map
+            # cleanly onto the palette, so error diffusion buys nothing and
+            # bayer is much cheaper per pixel
             output = ffmpeg.filter(
                 [scaled, palette],
                 "paletteuse",
-                dither="floyd_steinberg",  # Best balance of quality and sharpness
+                dither="bayer",
+                bayer_scale=5,
                 diff_mode="rectangle"
             )
             
@@ -130,32 +203,79 @@ class FFmpegProcessor:
                 **{"f": "gif"},
             )
             
-            # Run FFmpeg
-            output.overwrite_output().run(
+            # Run FFmpeg; stderr carries the input description. The banner
+            # and per-frame progress lines are suppressed so the captured
+            # stderr stays a few lines long however long the clip is.
+            _, stderr = output.global_args(
+                "-hide_banner",
+                "-nostats",
+                "-filter_complex_threads", str(FILTER_THREADS)
+            ).overwrite_output().run(
                 capture_stdout=True,
                 capture_stderr=True,
                 quiet=True,
             )
             
-            # Validate output
-            if not output_path.exists():
+            # Validate output with a single stat() call
+            try:
+                gif_size = output_path.stat().st_size
+            except FileNotFoundError:
                 raise GIFGenerationError("GIF file was not created")
             
-            if output_path.stat().st_size == 0:
+            if gif_size == 0:
                 raise GIFGenerationError("GIF file is empty")
             
+            info = _parse_input_info(stderr.decode(errors="replace"))
+            info["gif_size_bytes"] = gif_size
+            return info
+            
         except (FFmpegError, GIFGenerationError):
             raise
+        except ffmpeg.Error as e:
+            stderr = e.stderr.decode(errors="replace") if e.stderr else str(e)
+            raise GIFGenerationError(
+                f"Error during GIF generation: FFmpeg processing failed: {stderr}"
+            )
         except Exception as e:
-            # Handle any other exceptions (including ffmpeg.Error if present)
-            error_msg = str(e)
-            if hasattr(e, 'stderr'):
-                try:
-                    stderr = e.stderr.decode() if isinstance(e.stderr, bytes) else str(e.stderr)
-                    error_msg = f"FFmpeg processing failed: {stderr}"
-                except:
-                    pass
-            raise GIFGenerationError(f"Error during GIF generation: {error_msg}")
+            raise GIFGenerationError(f"Error during GIF generation: {e}")
+    
+    def mux_frames(self, frames: List[bytes], fps: int, output_path: Path) -> None:
+        """
+        Write PNG frames into a video container without re-encoding.
+        
+        Frames are piped to FFmpeg as an image2pipe stream and stream-copied
+        into Matroska, so the capture step does no lossy encoding of its own.
+        
+        Args:
+            frames: PNG-encoded frames at a constant rate
+            fps: Frame rate of the frame sequence
+            output_path: Path to output video file
+            
+        Raises:
+            FFmpegError: If FFmpeg fails to write the video
+        """
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            (
+                ffmpeg
+                .input("pipe:", format="image2pipe", framerate=fps)
+                .output(str(output_path), vcodec="copy")
+                # Only errors are read from stderr here
+                .global_args("-hide_banner", "-nostats", "-loglevel", "error")
+                .overwrite_output()
+                .run(input=b"".join(frames), capture_stdout=True, capture_stderr=True, quiet=True)
+            )
+        except ffmpeg.Error as e:
+            stderr = e.stderr.decode(errors="replace") if e.stderr else str(e)
+            raise FFmpegError(f"Failed to write captured frames: {stderr}")
+        
+        try:
+            video_size = output_path.stat().st_size
+        except FileNotFoundError:
+            video_size = 0
+        if video_size == 0:
+            raise FFmpegError("Captured video file was not created")
     
     def get_video_info(self, video_path: Path) -> dict:
         """
@@ -187,21 +307,17 @@ class FFmpegProcessor:
                 "duration": float(probe["format"].get("duration", 0)),
                 "width": int(video_stream.get("width", 0)),
                 "height": int(video_stream.get("height", 0)),
-                "fps": eval(video_stream.get("r_frame_rate", "0/1")),
+                # ffprobe reports rates as "num/den"; never eval() probe output
+                "fps": float(Fraction(video_stream.get("r_frame_rate", "0/1"))),
             }
             
         except FFmpegError:
             raise
+        except ffmpeg.Error as e:
+            stderr = e.stderr.decode(errors="replace") if e.stderr else str(e)
+            raise FFmpegError(f"Failed to get video info: ffprobe failed: {stderr}")
         except Exception as e:
-            # Handle any exceptions (including ffmpeg.Error if present)
-            error_msg = str(e)
-            if hasattr(e, 'stderr'):
-                try:
-                    stderr = e.stderr.decode() if isinstance(e.stderr, bytes) else str(e.stderr)
-                    error_msg = f"ffprobe failed: {stderr}"
-                except:
-                    pass
-            raise FFmpegError(f"Failed to get video info: {error_msg}")
+            raise FFmpegError(f"Failed to get video info: {e}")
 
 
 def transcode_to_gif_node(state: GraphState) -> GraphState:
@@ -233,23 +349,29 @@ def transcode_to_gif_node(state: GraphState) -> GraphState:
         
         # Convert to GIF
         processor = FFmpegProcessor()
-        processor.convert_to_gif(video_path, output_path)
-        
-        # Get video info for metadata
-        video_info = processor.get_video_info(video_path)
+        artifacts = state.get("artifacts", {})
+        # The encode reports the input's metadata, so no separate ffprobe run
+        video_info = processor.convert_to_gif(
+            video_path,
+            output_path,
+            start_offset=artifacts.get("capture_offset", 1.0),
+            duration=artifacts.get("capture_duration"),
+        )
         
-        # Update state
+        # Update state; the encode already stat()ed the output
+        gif_size = video_info.pop("gif_size_bytes")
         state["gif_path"] = str(output_path)
         state["artifacts"]["video_info"] = video_info
-        state["artifacts"]["gif_size_bytes"] = output_path.stat().st_size
+        state["artifacts"]["gif_size_bytes"] = gif_size
         
         logger.end(state, {
             "gif_path": str(output_path),
-            "gif_size_mb": round(output_path.stat().st_size / 1024 / 1024, 2),
+            "gif_size_mb": round(gif_size / 1024 / 1024, 2),
         })
         
         # Clean up video file after successful processing
-        # We don't need the intermediate WebM file anymore
+        # The intermediate .mkv muxed from the PNG screencast frames is no
+        # longer needed once the GIF exists
         try:
             video_path.unlink()
             logger.info("Deleted input video file", metadata={"video_path": str(video_path)})
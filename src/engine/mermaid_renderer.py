@@ -3,25 +3,333 @@ Mermaid.js Direct Renderer
 Native Mermaid.js rendering module using Playwright
 """
 
-from playwright.async_api import async_playwright, Page, Browser
+from playwright.async_api import Page, Route
+from .animation_applicator import FLOW_ANIMATION_JS
+from .browser_pool import (
+    CONTENT_LOAD_TIMEOUT_MS,
+    LAYOUT_VIEWPORT,
+    RENDER_TIMEOUT_MS,
+    SCRIPT_LOAD_TIMEOUT_MS,
+    close_quietly,
+    get_browser_pool,
+    operation_timeout_ms,
+    run_async,
+    run_sync,
+)
+from .render_cache import RenderCache, get_render_cache
 from ..core.config import get_config
 from ..utils.logger import get_logger
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, List, Optional
 import asyncio
-import nest_asyncio
-
-# Allow nested event loops for LangGraph compatibility
-nest_asyncio.apply()
+import functools
+import hashlib
+import os
 
 logger = get_logger("mermaid_renderer")
 
+# Concurrent renders in render_many(); each holds its own context and page
+MAX_CONCURRENT_RENDERS = min(os.cpu_count() or 1, 8)
+
+# Smallest width/height (CSS pixels) accepted as a real diagram; anything
+# smaller means Mermaid.js produced an empty or collapsed SVG
+MIN_DIAGRAM_SIZE = 10
+
+# Installed as an init script on render pages, so each render is a single
+# short evaluate instead of re-sending the whole function and config
+RENDER_MERMAID_JS = """
+// Called once per page while it is prepared, off the render path
+window.__initMermaid = () => {
+    mermaid.initialize({
+        startOnLoad: false,
+        theme: 'default',
+        securityLevel: 'loose',
+        flowchart: {
+            useMaxWidth: false,  // Allow diagrams to render at natural width
+            htmlLabels: true
+        },
+        sequence: {
+            useMaxWidth: false,
+            diagramMarginX: 50,
+            diagramMarginY: 10,
+            actorMargin: 50,
+            width: 200,
+            height: 65,
+            boxMargin: 10,
+            boxTextMargin: 5,
+            noteMargin: 10,
+            messageMargin: 35,
+            mirrorActors: true,
+            fontSize: 16,
+            messageFontSize: 16,
+            noteFontSize: 14
+        }
+    });
+};
+
+window.__renderMermaid = async (code, animationDuration) => {
+    try {
+        // Render the diagram
+        const { svg } = await mermaid.render('mermaid-diagram', code);
+
+        // Insert into container
+        const container = document.getElementById('diagram-container');
+        container.innerHTML = svg;
+
+        // Measure while the page is laid out, so capture can reuse it
+        const rect = container.querySelector('svg').getBoundingClientRect();
+
+        // Downstream pages only need the static SVG; dropping the
+        // scripts keeps them from re-fetching Mermaid.js on load
+        document.querySelectorAll('script').forEach(el => el.remove());
+
+        // Animate in the same page when a duration is given, so the
+        // animation step doesn't have to load the HTML again
+        const animation = animationDuration
+            ? window.__applyFlowAnimation(animationDuration)
+            : null;
+
+        // Serialize in the same round-trip instead of a
+        // separate page.content() call
+        return {
+            success: true,
+            animated: animation !== null,
+            svg: svg,
+            pathsAnimated: animation ? animation.pathsAnimated : 0,
+            html: '<!DOCTYPE html>' + document.documentElement.outerHTML,
+            width: Math.ceil(rect.width),
+            height: Math.ceil(rect.height)
+        };
+    } catch (error) {
+        return { success: false, error: error.toString() };
+    }
+};
+"""
+
+# Everything a render page needs installed before its first document loads,
+# joined once at import so each new page context gets a single init script
+RENDER_PAGE_INIT_JS = RENDER_MERMAID_JS + FLOW_ANIMATION_JS
+
+
+# Mermaid.js bundle shipped with the package (downloaded at image build time).
+# When present it is installed as an init script and the CDN is never used.
+MERMAID_BUNDLE_PATH = Path(__file__).parent / "assets" / "mermaid.min.js"
+
+
+@functools.lru_cache(maxsize=None)
+def _bundled_mermaid_js() -> Optional[str]:
+    """Read the packaged Mermaid.js bundle once, or None if the build has none."""
+    try:
+        return MERMAID_BUNDLE_PATH.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+# Mermaid.js build loaded from the CDN when no bundle is packaged
+MERMAID_CDN_URL = "https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"
+
+
+@functools.lru_cache(maxsize=None)
+def _render_page_init_js() -> str:
+    """Init script for render pages, prefixed with the Mermaid.js bundle if packaged."""
+    bundle = _bundled_mermaid_js()
+    if bundle is None:
+        return RENDER_PAGE_INIT_JS
+    return bundle + "\n;\n" + RENDER_PAGE_INIT_JS
+
+
+# Script bodies already read from disk or the network, keyed by URL, so only
+# the first page in a process touches the disk cache
+_script_bodies: Dict[str, bytes] = {}
+
+# Digest of the CDN Mermaid.js build pages load, once it is known
+_cdn_build_id: Optional[str] = None
+
+
+def _script_cache_file(url: str) -> Path:
+    """Get the on-disk cache path for a script URL."""
+    return get_config().browser_cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()[:16]}.js"
+
+
+@functools.lru_cache(maxsize=None)
+def _bundle_build_id() -> str:
+    """Digest of the packaged Mermaid.js bundle (only called when it exists)."""
+    return hashlib.blake2b(_bundled_mermaid_js().encode(), digest_size=16).hexdigest()
+
+
+async def _mermaid_build_id() -> Optional[str]:
+    """
+    Identify the Mermaid.js build that render pages actually run.
+    
+    The CDN script floats on mermaid@10 and the bundle changes whenever the
+    image pins a new version, so render cache keys include a digest of the
+    loaded script; an upgraded build then misses instead of serving SVGs
+    from the old one.
+    
+    Returns:
+        Hex digest of the script, or None while the CDN script has not been
+        fetched yet in this process or any earlier one
+    """
+    global _cdn_build_id
+    if _bundled_mermaid_js() is not None:
+        return _bundle_build_id()
+    
+    if _cdn_build_id is None:
+        body = _script_bodies.get(MERMAID_CDN_URL)
+        if body is None:
+            try:
+                body = await asyncio.to_thread(_script_cache_file(MERMAID_CDN_URL).read_bytes)
+            except OSError:
+                return None
+            _script_bodies[MERMAID_CDN_URL] = body
+        _cdn_build_id = hashlib.blake2b(body, digest_size=16).hexdigest()
+    return _cdn_build_id
+
+
+async def _serve_cached_script(route: Route) -> None:
+    """
+    Fulfill a script request from memory or the on-disk cache, filling both on a miss.
+    
+    Browser contexts are ephemeral and don't share an HTTP cache, so without
+    this every render page would download Mermaid.js from the CDN again.
+    
+    Args:
+        route: Intercepted script request
+    """
+    url = route.request.url
+    
+    body = _script_bodies.get(url)
+    if body is not None:
+        await route.fulfill(body=body, content_type="application/javascript")
+        return
+    
+    cache_file = _script_cache_file(url)
+    
+    try:
+        body = await asyncio.to_thread(cache_file.read_bytes)
+    except FileNotFoundError:
+        pass
+    else:
+        _script_bodies[url] = body
+        await route.fulfill(body=body, content_type="application/javascript")
+        return
+    
+    try:
+        response = await route.fetch()
+    except Exception as e:
+        # Fail the request so the script tag's onerror fires right away,
+        # instead of leaving the page waiting out the script load timeout
+        logger.warning("Could not fetch script", metadata={"url": url, "error": str(e)})
+        await route.abort()
+        return
+    
+    if response.ok:
+        body = await response.body()
+        _script_bodies[url] = body
+        
+        def write_cache() -> None:
+            # Write then rename so a concurrent reader never sees a partial file
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            partial = cache_file.with_suffix(".part")
+            partial.write_bytes(body)
+            partial.replace(cache_file)
+        
+        try:
+            await asyncio.to_thread(write_cache)
+        except OSError as e:
+            logger.warning("Could not cache script", metadata={"url": url, "error": str(e)})
+    
+    await route.fulfill(response=response)
+
+
+def render_many(
+    codes: List[str],
+    animation_duration: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Render several diagrams concurrently on the shared browser.
+    
+    Each diagram gets its own context and page (Mermaid.js keeps global
+    state per page), at most MAX_CONCURRENT_RENDERS at a time.
+    
+    Args:
+        codes: Mermaid diagram sources
+        animation_duration: If set, also apply the flow animation
+        
+    Returns:
+        Render results in the same order as `codes`
+    """
+    return run_sync(_render_many_async(codes, animation_duration))
+
+
+async def _render_many_async(
+    codes: List[str],
+    animation_duration: Optional[float]
+) -> List[Dict[str, Any]]:
+    """Fan renders out over separate contexts, bounded by a semaphore."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+    
+    async def render_one(code: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await _render_cached(code, animation_duration)
+    
+    return await asyncio.gather(*(render_one(code) for code in codes))
+
+
+async def _render_cached(
+    mermaid_code: str,
+    animation_duration: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Render through the render cache.
+    
+    Identical source renders identically on the same Mermaid.js build, so a
+    cache hit skips the browser. Diagrams that also depend on the current
+    date bypass the cache.
+    
+    Args:
+        mermaid_code: Mermaid diagram syntax
+        animation_duration: If set, also apply the flow animation
+        
+    Returns:
+        Render result as returned by MermaidRenderer.render()
+    """
+    # Until the CDN script has been fetched once, the build that will render
+    # is unknown, so there is nothing safe to key on
+    mermaid_build = await _mermaid_build_id()
+    if mermaid_build is None or not RenderCache.is_cacheable(mermaid_code):
+        return await get_mermaid_renderer().render(
+            mermaid_code, animation_duration=animation_duration
+        )
+    
+    cache = get_render_cache()
+    cache_key = cache.key(mermaid_code, animation_duration, mermaid_build)
+    result = await cache.get_async(cache_key)
+    
+    if result is None:
+        result = await get_mermaid_renderer().render(
+            mermaid_code, animation_duration=animation_duration
+        )
+        await cache.put_async(cache_key, result)
+    else:
+        logger.info("Using cached render", metadata={"cache_key": cache_key})
+    
+    return result
+
 
 def render_mermaid_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Synchronous wrapper for async Mermaid rendering.
     Required for LangGraph compatibility.
     """
-    return asyncio.run(_render_mermaid_async(state))
+    return run_sync(_render_mermaid_async(state))
+
+
+async def render_mermaid_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of render_mermaid_node for graphs run with ainvoke().
+    """
+    return await run_async(_render_mermaid_async(state))
 
 
 async def _render_mermaid_async(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -32,7 +340,7 @@ async def _render_mermaid_async(state: Dict[str, Any]) -> Dict[str, Any]:
         state: Graph state containing mermaid_code
         
     Returns:
-        Updated state with render_html artifact
+        Updated state with render_html and svg_dimensions artifacts
     """
     mermaid_code = state.get("mermaid_code", "")
     
@@ -44,20 +352,36 @@ async def _render_mermaid_async(state: Dict[str, Any]) -> Dict[str, Any]:
         "code_preview": mermaid_code[:100]
     })
     
-    renderer = MermaidRenderer()
     try:
-        render_html = await renderer.render(mermaid_code)
+        # Apply the flow animation while the page is still open; the
+        # animation node then has nothing left to do
+        duration = state.get("duration", 5.0)
+        
+        result = await _render_cached(mermaid_code, duration)
+        render_html = result["html"]
         
         # Store in artifacts
+        # The SVG size is kept so the capture phase can skip re-measuring it
         if "artifacts" not in state:
             state["artifacts"] = {}
         state["artifacts"]["render_html"] = render_html
+        # Static SVG text, for consumers that need vector output and no browser
+        state["artifacts"]["svg"] = result["svg"]
+        state["artifacts"]["svg_dimensions"] = {
+            "width": result["width"],
+            "height": result["height"],
+        }
         
         # Set flag to indicate successful rendering
         state["diagram_rendered"] = True
         
+        if result["animated"]:
+            state["artifacts"]["animated_html"] = render_html
+            state["animation_applied"] = True
+        
         logger.info("Mermaid rendering completed", metadata={
-            "html_size": len(render_html)
+            "html_size": len(render_html),
+            "paths_animated": result["paths_animated"]
         })
         
         return state
@@ -70,48 +394,31 @@ async def _render_mermaid_async(state: Dict[str, Any]) -> Dict[str, Any]:
 
 
 class MermaidRenderer:
-    """Renders Mermaid diagrams to SVG using Playwright and Mermaid.js CDN"""
+    """Renders Mermaid diagrams to SVG using Playwright and Mermaid.js (bundled or from the CDN)"""
     
-    def __init__(self):
-        self.config = get_config()
-        self.logger = get_logger("mermaid_renderer")
+    # Loads Mermaid.js from the CDN when no bundle is packaged
+    CDN_SCRIPT_TAG = f"""<script src="{MERMAID_CDN_URL}"
+            onload="window.__resolveReady()"
+            onerror="window.__rejectReady(new Error('Failed to load Mermaid.js'))"></script>"""
     
-    async def render(self, mermaid_code: str) -> str:
-        """
-        Render Mermaid code to full HTML with embedded SVG.
-        
-        Args:
-            mermaid_code: Mermaid diagram syntax
-            
-        Returns:
-            Full HTML document with rendered SVG
-        """
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(
-                headless=True,
-                args=[
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                ]
-            )
-            
-            try:
-                # Use wide viewport to allow LR diagrams to render at full resolution
-                page = await browser.new_page(
-                    viewport={"width": 4000, "height": 3000}
-                )
-                
-                # Create HTML shell with Mermaid.js
-                html_template = f"""
+    # HTML shell with Mermaid.js. It never changes, so it is built once here
+    # rather than re-formatted on every render() call.
+    HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Mermaid Diagram</title>
-    <script src="https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"></script>
+    <script>
+        window.mermaidReadyPromise = new Promise((resolve, reject) => {
+            window.__resolveReady = resolve;
+            window.__rejectReady = reject;
+        });
+    </script>
+    """ + CDN_SCRIPT_TAG + """
     <style>
-        body {{
+        body {
             margin: 0;
             padding: 20px;
             display: flex;
@@ -119,10 +426,10 @@ class MermaidRenderer:
             align-items: center;
             min-height: 100vh;
             background: white;
-        }}
-        #diagram-container {{
+        }
+        #diagram-container {
             /* Removed max-width constraint to allow wide diagrams */
-        }}
+        }
     </style>
 </head>
 <body>
@@ -130,69 +437,159 @@ class MermaidRenderer:
 </body>
 </html>
 """
-                
-                self.logger.info("Loading Mermaid.js library")
-                await page.set_content(html_template)
-                
-                # Wait for Mermaid.js to load
-                await page.wait_for_function("typeof mermaid !== 'undefined'")
-                
-                self.logger.info("Rendering Mermaid diagram")
-                
-                # Render Mermaid code to SVG
-                svg_result = await page.evaluate(f"""
-                    async (code) => {{
-                        try {{
-                            // Initialize Mermaid with configuration
-                            mermaid.initialize({{
-                                startOnLoad: false,
-                                theme: 'default',
-                                securityLevel: 'loose',
-                                flowchart: {{
-                                    useMaxWidth: false,  // Allow diagrams to render at natural width
-                                    htmlLabels: true
-                                }},
-                                sequence: {{
-                                    useMaxWidth: false,
-                                    diagramMarginX: 50,
-                                    diagramMarginY: 10,
-                                    actorMargin: 50,
-                                    width: 200,
-                                    height: 65,
-                                    boxMargin: 10,
-                                    boxTextMargin: 5,
-                                    noteMargin: 10,
-                                    messageMargin: 35,
-                                    mirrorActors: true,
-                                    fontSize: 16,
-                                    messageFontSize: 16,
-                                    noteFontSize: 14
-                                }}
-                            }});
-                            
-                            // Render the diagram
-                            const {{ svg }} = await mermaid.render('mermaid-diagram', code);
-                            
-                            // Insert into container
-                            document.getElementById('diagram-container').innerHTML = svg;
-                            
-                            return {{ success: true, svg: svg }};
-                        }} catch (error) {{
-                            return {{ success: false, error: error.toString() }};
-                        }}
-                    }}
-                """, mermaid_code)
-                
-                if not svg_result.get("success"):
-                    error_msg = svg_result.get("error", "Unknown error")
-                    raise RuntimeError(f"Mermaid rendering failed: {error_msg}")
-                
-                self.logger.info("Mermaid diagram rendered successfully")
-                
-                # Get the full HTML with rendered SVG
-                full_html = await page.content()
-                
-                return full_html
-                
-            finally:
-                await browser.close()
+    
+    # The same shell for when the bundled Mermaid.js is installed as an init
+    # script: it is defined before the document's own scripts run
+    BUNDLED_HTML_TEMPLATE = HTML_TEMPLATE.replace(
+        CDN_SCRIPT_TAG, "<script>window.__resolveReady()</script>"
+    )
+    
+    def __init__(self):
+        self.config = get_config()
+        self.logger = get_logger("mermaid_renderer")
+    
+    @classmethod
+    async def _prepare_page(cls, page: Page) -> None:
+        """
+        Load the HTML shell and wait for Mermaid.js, leaving the page ready to render.
+        
+        Args:
+            page: Fresh page to prepare
+        """
+        if _bundled_mermaid_js() is not None:
+            template = cls.BUNDLED_HTML_TEMPLATE
+        else:
+            # Serve Mermaid.js from the disk cache instead of re-downloading it
+            await page.route("**/mermaid.min.js", _serve_cached_script)
+            template = cls.HTML_TEMPLATE
+        
+        await page.set_content(
+            template,
+            wait_until="domcontentloaded",
+            timeout=operation_timeout_ms(CONTENT_LOAD_TIMEOUT_MS)
+        )
+        
+        # Wait for Mermaid.js to load (resolved by the script's onload, no polling)
+        # and initialize it in the same round-trip, so renders never have to.
+        # evaluate() has no timeout of its own, so bound it here.
+        await asyncio.wait_for(
+            page.evaluate("() => window.mermaidReadyPromise.then(window.__initMermaid)"),
+            timeout=operation_timeout_ms(SCRIPT_LOAD_TIMEOUT_MS) / 1000
+        )
+    
+    @staticmethod
+    async def _reset_page(page: Page) -> None:
+        """
+        Return a used render page to its freshly prepared state.
+        
+        Mermaid.js stays loaded and initialized; only what a render added to
+        the document is removed.
+        
+        Args:
+            page: Page that has completed a render
+        """
+        await page.evaluate("""() => {
+            document.getElementById('diagram-container').innerHTML = '';
+            document.querySelectorAll('style[data-flow-animation], [id^="dmermaid-diagram"]')
+                .forEach(el => el.remove());
+        }""")
+    
+    async def render(
+        self,
+        mermaid_code: str,
+        animation_duration: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Render Mermaid code to full HTML with embedded SVG.
+        
+        Args:
+            mermaid_code: Mermaid diagram syntax
+            animation_duration: If set, also apply the flow animation with this
+                                cycle length before serializing
+            
+        Returns:
+            dict: Full HTML document with rendered SVG ("html"), the static
+                  SVG markup as produced by Mermaid.js ("svg"), the SVG's
+                  bounding box in CSS pixels ("width", "height"), whether the
+                  animation was applied ("animated"), and how many paths it
+                  animated ("paths_animated")
+        """
+        # Use wide viewport to allow LR diagrams to render at full resolution.
+        # Pages come pre-loaded with Mermaid.js from the pool's warm queue
+        # and go back to it after a reset.
+        context, page = await get_browser_pool().acquire_page(
+            "mermaid_renderer",
+            self._prepare_page,
+            init_script=_render_page_init_js(),
+            viewport=LAYOUT_VIEWPORT
+        )
+        
+        reusable = False
+        try:
+            self.logger.info("Rendering Mermaid diagram")
+            
+            # Render Mermaid code to SVG
+            svg_result = await asyncio.wait_for(
+                page.evaluate(
+                    "([code, duration]) => window.__renderMermaid(code, duration)",
+                    [mermaid_code, animation_duration]
+                ),
+                timeout=operation_timeout_ms(RENDER_TIMEOUT_MS) / 1000
+            )
+            
+            # The render completed in-page (even a syntax error is reported
+            # cleanly), so the page can be reset and handed to the next render
+            reusable = True
+            
+            if not svg_result.get("success"):
+                error_msg = svg_result.get("error", "Unknown error")
+                raise RuntimeError(f"Mermaid rendering failed: {error_msg}")
+            
+            # The size comes back with the render, so validating it costs no
+            # extra round-trip
+            width, height = svg_result["width"], svg_result["height"]
+            if width < MIN_DIAGRAM_SIZE or height < MIN_DIAGRAM_SIZE:
+                raise RuntimeError(
+                    f"Mermaid rendering produced an empty diagram ({width}x{height})"
+                )
+            
+            self.logger.info("Mermaid diagram rendered successfully")
+            
+            return {
+                "html": svg_result["html"],
+                "width": width,
+                "height": height,
+                "svg": svg_result["svg"],
+                "animated": svg_result["animated"],
+                "paths_animated": svg_result["pathsAnimated"],
+            }
+            
+        finally:
+            if reusable:
+                await get_browser_pool().release_page(
+                    "mermaid_renderer", context, page, self._reset_page
+                )
+            else:
+                await close_quietly(context)
+
+
+# Global renderer instance
+# This will be initialized on first use
+_renderer: Optional[MermaidRenderer] = None
+
+
+def get_mermaid_renderer() -> MermaidRenderer:
+    """
+    Get the global Mermaid renderer instance.
+    
+    The renderer itself is stateless; its pages live in the browser pool's
+    warm queue, already loaded with Mermaid.js, so every render after the
+    first is a single evaluate on a ready page.
+    
+    Returns:
+        MermaidRenderer: The process-wide renderer
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = MermaidRenderer()
+    return _renderer
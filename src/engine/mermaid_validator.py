@@ -10,17 +10,130 @@ CRITICAL FEATURES:
 - No external API calls (local validation)
 """
 
-import json
-import subprocess
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+import functools
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 
 from ..core.config import get_config
 from ..core.exceptions import ValidationError
 from ..core.state import GraphState
 from ..utils.logger import get_logger
 
-logger = get_logger("mermaid_validator")
+# The validator only reads the code and writes its errors; hashing just those
+# fields keeps rendered artifacts out of every START/END log
+logger = get_logger(
+    "mermaid_validator",
+    hash_fields=("mermaid_code", "validation_errors", "retry_count"),
+)
+
+# Diagram type declarations a diagram may start with
+VALID_DIAGRAM_TYPES = (
+    'graph', 'flowchart', 'sequencediagram', 'classDiagram',
+    'stateDiagram', 'erDiagram', 'journey', 'gantt', 'pie',
+    'gitGraph', 'mindmap', 'timeline', 'quadrantChart'
+)
+
+# Lowercased once, as a tuple so a single str.startswith() call checks them all
+_VALID_TYPE_PREFIXES = tuple(t.lower() for t in VALID_DIAGRAM_TYPES)
+
+# Diagram types whose syntax legitimately spans braces across lines, so
+# per-line bracket matching would report false errors:
+# - ER diagrams: cardinality symbols (||--o{, }o--||)
+# - Class diagrams: class body definitions (class Name { ... })
+# - State diagrams: composite states (state Name { ... })
+_MULTILINE_BRACE_TYPES = ('erdiagram', 'classdiagram', 'statediagram')
+
+# Characters of the first line inspected for the diagram type; comfortably
+# longer than any type keyword (plus a suffix such as "-v2")
+_TYPE_PREFIX_LENGTH = 32
+
+# bytes.translate() tables that reduce a diagram to its brackets in one
+# C-level pass: everything but brackets and newlines is deleted, openers
+# become '(' and closers ')'. Multi-byte UTF-8 sequences never contain
+# these ASCII bytes.
+_NON_BRACKET_BYTES = bytes(b for b in range(256) if b not in b'[](){}\n')
+_BRACKET_TABLE = bytes.maketrans(b'[{]}', b'(())')
+
+
+class _LineError(NamedTuple):
+    """A syntax error as produced by the checks; converted to a dict by validate()."""
+    message: str
+    line: int
+
+
+# Errors whose text and line never vary are built once and shared
+_INVALID_TYPE_ERROR = _LineError(
+    f"Invalid or missing diagram type. Must start with one of: {', '.join(VALID_DIAGRAM_TYPES)}",
+    1
+)
+_SINGLE_LINE_ERROR = _LineError(
+    "Multiple statements on a single line without semicolons. Mermaid requires newlines or semicolons between statements.",
+    1
+)
+
+# Number of validation results kept in memory
+VALIDATION_CACHE_ENTRIES = 512
+
+# Longest stripped diagram (in characters) whose result is cached
+MAX_CACHED_CODE_LENGTH = 64 * 1024
+
+
+def _check_syntax(stripped_code: str) -> Tuple[_LineError, ...]:
+    """
+    Run the rule-based syntax checks on stripped, non-empty Mermaid code.
+    
+    Args:
+        stripped_code: Mermaid diagram code with surrounding whitespace removed
+        
+    Returns:
+        Tuple of line errors, empty if the code is valid. Immutable rather
+        than dicts so results can be shared from the cache.
+    """
+    # Basic syntax validation rules
+    errors = []
+    lines = stripped_code.split('\n')
+    
+    # Check for diagram type declaration. The code is already stripped, and
+    # only the start of the line can name the type, so just that bounded
+    # prefix is lowercased however long the line is.
+    first_line = lines[0]
+    type_prefix = first_line[:_TYPE_PREFIX_LENGTH].lower()
+    has_valid_type = type_prefix.startswith(_VALID_TYPE_PREFIXES)
+    
+    if not has_valid_type:
+        errors.append(_INVALID_TYPE_ERROR)
+    
+    # Check for single-line error (common with simple prompts)
+    # e.g., "graph TD A-->B" without semicolon or newline
+    if len(lines) == 1 and ("-->" in first_line or "---" in first_line):
+        if ";" not in first_line:
+            errors.append(_SINGLE_LINE_ERROR)
+    
+    # The diagram type doesn't change between lines, so decide once
+    # whether bracket matching applies
+    skip_bracket_check = any(t in type_prefix for t in _MULTILINE_BRACE_TYPES)
+    
+    # Check for unclosed brackets/parentheses. The whole diagram is
+    # reduced to its brackets in one C-level pass, keeping newlines so
+    # the result still splits into one bracket string per line.
+    if not skip_bracket_check:
+        bracket_lines = stripped_code.encode('utf-8', 'surrogatepass').translate(
+            _BRACKET_TABLE, _NON_BRACKET_BYTES
+        ).split(b'\n')
+        
+        for i, brackets in enumerate(bracket_lines, 1):
+            # Balanced when exactly half of the brackets are openers;
+            # blank lines are trivially balanced, and comments are
+            # only looked at once they fail
+            if (brackets.count(b'(') * 2 != len(brackets)
+                    and not lines[i - 1].lstrip().startswith('%%')):
+                errors.append(_LineError("Mismatched brackets/parentheses", i))
+    
+    return tuple(errors)
+
+
+# Fix-loop retries and repeated runs validate the same code again, so
+# results are memoized. Very large diagrams bypass the cache to bound memory.
+_check_syntax_cached = functools.lru_cache(maxsize=VALIDATION_CACHE_ENTRIES)(_check_syntax)
 
 
 class MermaidValidator:
@@ -58,79 +171,41 @@ class MermaidValidator:
             return False, [{"message": "Empty Mermaid code", "line": 0}]
         
         try:
-            # Create a simple validation script
-            # Since mermaid-parser-py might not be available, we'll use a basic
-            # syntax check approach that validates common Mermaid patterns
-            
-            # Basic syntax validation rules
-            errors = []
             stripped_code = mermaid_code.strip()
-            lines = stripped_code.split('\n')
-            
-            # Check for diagram type declaration
-            first_line = lines[0].strip().lower()
-            valid_types = [
-                'graph', 'flowchart', 'sequencediagram', 'classDiagram',
-                'stateDiagram', 'erDiagram', 'journey', 'gantt', 'pie',
-                'gitGraph', 'mindmap', 'timeline', 'quadrantChart'
-            ]
-            
-            has_valid_type = any(first_line.startswith(t.lower()) for t in valid_types)
-            
-            if not has_valid_type:
-                errors.append({
-                    "message": f"Invalid or missing diagram type. Must start with one of: {', '.join(valid_types)}",
-                    "line": 1
-                })
-            
-            # Check for single-line error (common with simple prompts)
-            # e.g., "graph TD A-->B" without semicolon or newline
-            if len(lines) == 1 and ("-->" in first_line or "---" in first_line):
-                if ";" not in first_line:
-                    errors.append({
-                        "message": "Multiple statements on a single line without semicolons. Mermaid requires newlines or semicolons between statements.",
-                        "line": 1
-                    })
-            
-            # Check for basic syntax issues
-            for i, line in enumerate(lines, 1):
-                stripped = line.strip()
-                
-                # Skip empty lines and comments
-                if not stripped or stripped.startswith('%%'):
-                    continue
-                
-                # Check for unclosed brackets/parentheses
-                # BUT: Skip for diagram types that use multi-line curly braces
-                # - ER diagrams: cardinality symbols (||--o{, }o--||)
-                # - Class diagrams: class body definitions (class Name { ... })
-                # - State diagrams: composite states (state Name { ... })
-                
-                # Skip bracket matching for these diagram types
-                skip_bracket_check = any(keyword in first_line for keyword in [
-                    'erdiagram', 'classdiagram', 'statediagram'
-                ])
-                
-                if not skip_bracket_check:
-                    open_brackets = stripped.count('[') + stripped.count('(') + stripped.count('{')
-                    close_brackets = stripped.count(']') + stripped.count(')') + stripped.count('}')
-                    
-                    if open_brackets != close_brackets:
-                        errors.append({
-                            "message": f"Mismatched brackets/parentheses",
-                            "line": i
-                        })
-
-            
-            # If we have errors, return them
-            if errors:
-                return False, errors
-            
-            # If basic validation passes, return success
-            return True, None
-            
+            if len(stripped_code) <= MAX_CACHED_CODE_LENGTH:
+                errors = _check_syntax_cached(stripped_code)
+            else:
+                errors = _check_syntax(stripped_code)
         except Exception as e:
             raise ValidationError(f"Validation process failed: {str(e)}")
+        
+        # If we have errors, return them as fresh dicts the caller may modify
+        if errors:
+            return False, [{"message": e.message, "line": e.line} for e in errors]
+        
+        # If basic validation passes, return success
+        return True, None
+
+
+# Global validator instance
+# This will be initialized on first use
+_validator: Optional[MermaidValidator] = None
+
+
+def get_mermaid_validator() -> MermaidValidator:
+    """
+    Get the global Mermaid validator instance.
+    
+    The validator holds no per-diagram state, so one instance serves every
+    pass through the fix loop.
+    
+    Returns:
+        MermaidValidator: The process-wide validator
+    """
+    global _validator
+    if _validator is None:
+        _validator = MermaidValidator()
+    return _validator
 
 
 def mermaid_validator(state: GraphState) -> GraphState:
@@ -148,16 +223,15 @@ def mermaid_validator(state: GraphState) -> GraphState:
     Returns:
         GraphState: Updated state with validation_errors (if invalid)
     """
-    logger.start(state, {"mermaid_length": len(state.get("mermaid_code", ""))})
+    mermaid_code = state.get("mermaid_code")
+    logger.start(state, {"mermaid_length": len(mermaid_code or "")})
     
     try:
-        mermaid_code = state.get("mermaid_code")
         if not mermaid_code:
             raise ValidationError("No Mermaid code in state")
         
         # Validate
-        validator = MermaidValidator()
-        is_valid, errors = validator.validate(mermaid_code)
+        is_valid, errors = get_mermaid_validator().validate(mermaid_code)
         
         if is_valid:
             # Clear any previous validation errors
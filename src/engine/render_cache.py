@@ -0,0 +1,274 @@
+"""
+Content-addressed cache for rendered Mermaid diagrams.
+
+Rendering needs a browser page and a Mermaid.js run, which dominates the
+render node's wall time. The result depends only on the Mermaid source, the
+animation duration, and the renderer scripts, so it is cached under a hash of
+those inputs: first in a bounded in-memory LRU, then on disk.
+
+CRITICAL FEATURES:
+- blake2b keys over source + duration + RENDERER_VERSION + Mermaid.js build
+- In-memory LRU of the most recently used entries
+- On-disk JSON entries, written atomically, capped at DISK_ENTRIES files
+- Async get/put that keep disk I/O off the event loop
+- Corrupt or unreadable entries are treated as misses
+- Date-dependent diagrams (Gantt "today" markers) are never cached
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..core.config import get_config
+from ..utils.logger import get_logger
+
+logger = get_logger("render_cache")
+
+# Bump whenever the render or animation scripts change their output, so
+# entries produced by an older renderer are no longer hit
+RENDERER_VERSION = "3"
+
+# Number of entries kept in memory
+MEMORY_ENTRIES = 128
+
+# Number of entries kept on disk; the least recently used are deleted first
+DISK_ENTRIES = 1024
+
+# Gantt charts draw a marker at the current date unless it is turned off,
+# so their render changes from day to day even for identical source
+_GANTT_RE = re.compile(r"^\s*gantt\b", re.MULTILINE)
+_TODAY_MARKER_OFF_RE = re.compile(r"^\s*todayMarker\s+off\b", re.MULTILINE)
+
+
+class RenderCache:
+    """
+    Two-level (memory, disk) cache of render results.
+
+    Entries are the dicts returned by MermaidRenderer.render(); they must be
+    JSON-serializable.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_entries: int = MEMORY_ENTRIES,
+        max_disk_entries: int = DISK_ENTRIES
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory for on-disk entries (created on first write)
+            max_entries: Number of entries kept in memory
+            max_disk_entries: Number of entries kept on disk
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(
+        mermaid_code: str,
+        animation_duration: Optional[float],
+        mermaid_build: str = ""
+    ) -> str:
+        """
+        Compute the cache key for a render.
+
+        Args:
+            mermaid_code: Mermaid diagram syntax
+            animation_duration: Animation cycle length, or None if not animated
+            mermaid_build: Identifier (digest) of the Mermaid.js build rendering it
+
+        Returns:
+            str: Hex digest identifying the render
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(RENDERER_VERSION.encode())
+        digest.update(b"\0")
+        digest.update(mermaid_build.encode())
+        digest.update(b"\0")
+        digest.update(repr(animation_duration).encode())
+        digest.update(b"\0")
+        digest.update(mermaid_code.encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_cacheable(mermaid_code: str) -> bool:
+        """
+        Check whether a diagram's render depends only on its source.
+
+        Args:
+            mermaid_code: Mermaid diagram syntax
+
+        Returns:
+            bool: False for diagrams whose output also depends on the date
+        """
+        if _GANTT_RE.search(mermaid_code):
+            return _TODAY_MARKER_OFF_RE.search(mermaid_code) is not None
+        return True
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a render result.
+
+        Args:
+            key: Key from RenderCache.key()
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        entry = self._recall(key)
+        if entry is None:
+            entry = self._read(key)
+            if entry is not None:
+                self._remember(key, entry)
+        return entry
+
+    async def get_async(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a render result without blocking the event loop on disk reads.
+
+        Args:
+            key: Key from RenderCache.key()
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        entry = self._recall(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self._read, key)
+            if entry is not None:
+                self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a render result in memory and on disk.
+
+        Disk failures are logged and otherwise ignored; the cache is an
+        optimization, never a reason to fail a render.
+
+        Args:
+            key: Key from RenderCache.key()
+            result: Render result to store
+        """
+        self._remember(key, result)
+        self._write(key, result)
+
+    async def put_async(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a render result, writing it to disk on a worker thread.
+
+        Args:
+            key: Key from RenderCache.key()
+            result: Render result to store
+        """
+        self._remember(key, result)
+        await asyncio.to_thread(self._write, key, result)
+
+    def _recall(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up the in-memory LRU, marking a hit as most recently used."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        return entry
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read an on-disk entry, or None if it is missing or unreadable."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable render cache entry", metadata={
+                "key": key,
+                "error": str(e)
+            })
+            return None
+
+        # Mark the entry as recently used, so disk eviction keeps it
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write(self, key: str, result: Dict[str, Any]) -> None:
+        """Write an on-disk entry atomically, then enforce the disk cap."""
+        path = self._path(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename so a concurrent reader never sees a partial file
+            partial = path.with_suffix(".part")
+            partial.write_text(json.dumps(result), encoding="utf-8")
+            partial.replace(path)
+        except OSError as e:
+            logger.warning("Could not write render cache entry", metadata={
+                "key": key,
+                "error": str(e)
+            })
+            return
+
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Delete the least recently used disk entries beyond max_disk_entries."""
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+
+        entries = [e for e in entries if e.name.endswith(".json")]
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return
+
+        def last_used(entry: "os.DirEntry[str]") -> float:
+            try:
+                return entry.stat().st_mtime
+            except OSError:
+                return 0.0
+
+        for entry in sorted(entries, key=last_used)[:excess]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                # Already removed by a concurrent writer
+                pass
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entry if full."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        """Get the on-disk path for a key."""
+        return self.cache_dir / f"{key}.json"
+
+
+# Global cache instance
+# This will be initialized on first use
+_render_cache: Optional[RenderCache] = None
+
+
+def get_render_cache() -> RenderCache:
+    """
+    Get the global render cache instance.
+
+    Returns:
+        RenderCache: Cache stored under BROWSER_CACHE_DIR/renders
+    """
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache(get_config().browser_cache_dir / "renders")
+    return _render_cache
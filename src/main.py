@@ -9,7 +9,6 @@ Usage:
     python -m src.main --input-file diagram.mmd
 """
 
-import sys
 from pathlib import Path
 from typing import Optional
 
@@ -19,8 +18,6 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from .core.config import get_config
-from .core.graph import compile_graph
 from .core.state import create_initial_state
 from .utils.logger import configure_logging
 
@@ -111,10 +108,17 @@ def main(
             input_type=input_type,
         )
         
-        # Compile graph
+        # Compile graph. The graph pulls in LangGraph, LiteLLM and Playwright,
+        # so it is imported only once there is work to do; --help and input
+        # errors return without paying for it.
         console.print("\n[cyan]Initializing LangGraph workflow...[/cyan]")
+        from .core.graph import compile_graph
+        from .engine.browser_pool import prewarm
         graph = compile_graph()
         
+        # Launch the browser while the LLM and validation nodes run
+        prewarm()
+        
         # Execute workflow with progress indicator
         with Progress(
             SpinnerColumn(),
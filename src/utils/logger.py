@@ -5,15 +5,51 @@ All logs follow a strict JSON schema for observability and debugging.
 Every LangGraph node must emit START and END/ERROR logs.
 """
 
+import atexit
+import functools
 import hashlib
 import json
 import logging
+import queue
 import sys
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
 
 from ..core.state import GraphState
 
+# Reused for every state hash: json.dumps() with non-default options builds a
+# new encoder on each call
+_STATE_ENCODER = json.JSONEncoder(sort_keys=True, default=str)
+
+# Log entries are small, freshly built dicts, so the encoder can skip the
+# circular-reference bookkeeping json.dumps() does for every container
+_ENTRY_ENCODER = json.JSONEncoder(check_circular=False)
+
+# (epoch second, formatted "YYYY-MM-DDTHH:MM:SS" for that second). Stored as
+# one tuple so concurrent loggers never see a second paired with another
+# second's prefix.
+_timestamp_second = (-1, "")
+
+
+def _utc_timestamp() -> str:
+    """
+    Format the current UTC time like datetime.isoformat().
+    
+    The date and time-of-day part is formatted once per wall-clock second;
+    every other entry in that second only formats its microseconds.
+    
+    Returns:
+        str: Timestamp such as "2024-01-01T12:00:00.123456+00:00"
+    """
+    global _timestamp_second
+    second, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_second, prefix = _timestamp_second
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _timestamp_second = (second, prefix)
+    return f"{prefix}.{micros:06d}+00:00"
+
 
 # ============================================
 # Log Schema
@@ -33,16 +69,25 @@ class StructuredLogger:
     }
     """
     
-    def __init__(self, node_name: str, enable_structured: bool = True):
+    def __init__(
+        self,
+        node_name: str,
+        enable_structured: bool = True,
+        hash_fields: Optional[Tuple[str, ...]] = None,
+    ):
         """
         Initialize structured logger for a specific node.
         
         Args:
             node_name: Name of the LangGraph node
             enable_structured: Whether to use structured JSON logging
+            hash_fields: State keys the state hash covers (default: all).
+                Lets a node leave out large fields it never changes, such
+                as rendered HTML in artifacts.
         """
         self.node_name = node_name
         self.enable_structured = enable_structured
+        self.hash_fields = hash_fields
         self.logger = logging.getLogger(f"mermaid_gif.{node_name}")
     
     def _compute_state_hash(self, state: GraphState) -> str:
@@ -55,9 +100,13 @@ class StructuredLogger:
         Returns:
             str: Hexadecimal hash string
         """
+        if self.hash_fields is not None:
+            state = {key: state.get(key) for key in self.hash_fields}
+        
         # Serialize state to JSON (sorted keys for determinism)
-        state_json = json.dumps(state, sort_keys=True, default=str)
-        # Compute SHA256 hash
+        state_json = _STATE_ENCODER.encode(state)
+        # SHA256 is hardware-accelerated on current CPUs, which makes it
+        # faster here than BLAKE2b despite being a cryptographic hash
         return hashlib.sha256(state_json.encode()).hexdigest()
     
     def _emit_log(
@@ -76,23 +125,30 @@ class StructuredLogger:
             metadata: Additional metadata (optional)
             level: Log level
         """
+        # Building the entry costs a full state serialization and hash;
+        # skip it entirely when the record would be dropped anyway
+        if not self.logger.isEnabledFor(level):
+            return
+        
+        if not self.enable_structured:
+            # Emit as human-readable format; it shows neither the timestamp
+            # nor the state hash, so neither is computed
+            msg = f"[{event}] {self.node_name}"
+            if metadata:
+                msg += f" | {metadata}"
+            self.logger.log(level, msg)
+            return
+        
         log_entry = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": _utc_timestamp(),
             "node": self.node_name,
             "event": event,
             "state_hash": self._compute_state_hash(state) if state else None,
             "metadata": metadata or {},
         }
         
-        if self.enable_structured:
-            # Emit as JSON
-            self.logger.log(level, json.dumps(log_entry))
-        else:
-            # Emit as human-readable format
-            msg = f"[{event}] {self.node_name}"
-            if metadata:
-                msg += f" | {metadata}"
-            self.logger.log(level, msg)
+        # Emit as JSON
+        self.logger.log(level, _ENTRY_ENCODER.encode(log_entry))
     
     def start(self, state: GraphState, metadata: Optional[Dict[str, Any]] = None) -> None:
         """
@@ -171,12 +227,26 @@ def configure_logging(log_level: str = "INFO", structured: bool = True) -> None:
     # Set log level
     level = getattr(logging, log_level.upper(), logging.INFO)
     
-    # Configure root logger
-    logging.basicConfig(
-        level=level,
-        format="%(message)s" if structured else "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        stream=sys.stdout,
-    )
+    # Configure root logger. Like logging.basicConfig(), this only installs
+    # a handler the first time; later calls just update the level.
+    root = logging.getLogger()
+    root.setLevel(level)
+    
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter(
+            "%(message)s" if structured else "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        ))
+        
+        # Nodes only enqueue records; a listener thread does the stdout
+        # writes, keeping them off the graph's execution path
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        root.addHandler(QueueHandler(log_queue))
+        
+        listener = QueueListener(log_queue, handler)
+        listener.start()
+        # Drain whatever is still queued before the interpreter exits
+        atexit.register(listener.stop)
     
     # Suppress noisy third-party loggers
     logging.getLogger("playwright").setLevel(logging.WARNING)
@@ -184,15 +254,25 @@ def configure_logging(log_level: str = "INFO", structured: bool = True) -> None:
     logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
-def get_logger(node_name: str, enable_structured: bool = True) -> StructuredLogger:
+@functools.lru_cache(maxsize=None)
+def get_logger(
+    node_name: str,
+    enable_structured: bool = True,
+    hash_fields: Optional[Tuple[str, ...]] = None,
+) -> StructuredLogger:
     """
     Get a structured logger for a specific node.
     
+    Loggers hold no per-call state, so one instance per node name is shared
+    by every caller instead of being rebuilt (with its logging.getLogger()
+    lookup) on each call.
+    
     Args:
         node_name: Name of the LangGraph node
         enable_structured: Whether to use structured JSON logging
+        hash_fields: State keys the state hash covers (default: all)
         
     Returns:
         StructuredLogger: Configured logger instance
     """
-    return StructuredLogger(node_name, enable_structured)
+    return StructuredLogger(node_name, enable_structured, hash_fields)
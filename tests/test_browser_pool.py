@@ -0,0 +1,231 @@
+"""
+Tests for the shared browser pool, using fake Playwright objects.
+"""
+
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.engine import browser_pool
+from src.engine.browser_pool import (
+    CONTENT_LOAD_TIMEOUT_MS,
+    BrowserPool,
+    operation_timeout_ms,
+    run_sync,
+    shutdown,
+)
+
+
+class FakePage:
+    """Page that only tracks whether it was closed."""
+    
+    def __init__(self):
+        self.closed = False
+    
+    def is_closed(self):
+        return self.closed
+
+
+class FakeContext:
+    """Context that runs its close handlers like Playwright does."""
+    
+    def __init__(self, fail_route=False):
+        self.fail_route = fail_route
+        self.closed = False
+        self.pages = []
+        self._close_handlers = []
+    
+    def once(self, event, handler):
+        self._close_handlers.append(handler)
+    
+    async def route(self, pattern, handler):
+        if self.fail_route:
+            raise RuntimeError("route failed")
+    
+    async def add_init_script(self, script=None):
+        pass
+    
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+    
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for page in self.pages:
+            page.closed = True
+        for handler in self._close_handlers:
+            handler(self)
+
+
+class FakeBrowser:
+    """Connected browser that records every context it creates."""
+    
+    def __init__(self, fail_route=False):
+        self.fail_route = fail_route
+        self.contexts = []
+    
+    def is_connected(self):
+        return True
+    
+    async def new_context(self, **kwargs):
+        context = FakeContext(fail_route=self.fail_route)
+        self.contexts.append(context)
+        return context
+    
+    async def close(self):
+        pass
+
+
+async def prepare(page):
+    """Warm-page preparer that yields like a real page load would."""
+    await asyncio.sleep(0.01)
+
+
+async def reset_ok(page):
+    pass
+
+
+async def reset_fails(page):
+    raise RuntimeError("reset failed")
+
+
+class TestBrowserPool(unittest.IsolatedAsyncioTestCase):
+    """Tests for contexts, warm pages, and teardown on BrowserPool."""
+    
+    def make_pool(self, max_contexts=browser_pool.MAX_CONTEXTS, fail_route=False):
+        with patch.object(browser_pool, "MAX_CONTEXTS", max_contexts):
+            pool = BrowserPool()
+        pool._browser = FakeBrowser(fail_route=fail_route)
+        self.addAsyncCleanup(pool.close)
+        return pool
+    
+    async def test_context_slot_freed_when_context_closes(self):
+        """A caller waiting for a slot proceeds once a context is closed."""
+        pool = self.make_pool(max_contexts=1)
+        first = await pool.new_context()
+        
+        waiting = asyncio.create_task(pool.new_context())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        
+        await first.close()
+        second = await asyncio.wait_for(waiting, timeout=1)
+        self.assertIsNot(second, first)
+    
+    async def test_route_failure_closes_context_and_frees_slot(self):
+        """A context whose request filter fails is closed, not leaked."""
+        pool = self.make_pool(max_contexts=1, fail_route=True)
+        
+        with self.assertRaises(RuntimeError):
+            await pool.new_context()
+        self.assertTrue(pool._browser.contexts[0].closed)
+        
+        # The slot is free again, so the next attempt gets as far as route()
+        with self.assertRaises(RuntimeError):
+            await asyncio.wait_for(pool.new_context(), timeout=1)
+    
+    async def test_released_page_is_reused(self):
+        """A page that resets cleanly goes back to the warm queue."""
+        pool = self.make_pool()
+        context, page = await pool.acquire_page("key", prepare)
+        await pool._refills["key"]
+        # Make room for the returned page in the full warm queue
+        pool._warm["key"].get_nowait()
+        
+        await pool.release_page("key", context, page, reset_ok)
+        
+        self.assertFalse(context.closed)
+        self.assertIn((context, page), list(pool._warm["key"]._queue))
+    
+    async def test_failed_reset_closes_instead_of_requeueing(self):
+        """A page whose reset fails is closed and never handed out again."""
+        pool = self.make_pool()
+        context, page = await pool.acquire_page("key", prepare)
+        await pool._refills["key"]
+        pool._warm["key"].get_nowait()
+        
+        await pool.release_page("key", context, page, reset_fails)
+        
+        self.assertTrue(context.closed)
+        self.assertNotIn((context, page), list(pool._warm["key"]._queue))
+    
+    async def test_refill_stops_after_close(self):
+        """close() cancels warm-page refills and closes the warm contexts."""
+        pool = self.make_pool()
+        browser = pool._browser
+        context, _ = await pool.acquire_page("key", prepare)
+        refill = pool._refills["key"]
+        # Let the refill get partway through preparing a page
+        await asyncio.sleep(0.005)
+        
+        await pool.close()
+        created = len(browser.contexts)
+        await asyncio.sleep(0.05)
+        
+        self.assertTrue(refill.cancelled())
+        self.assertEqual(pool._refills, {})
+        self.assertEqual(pool._warm, {})
+        self.assertEqual(len(browser.contexts), created)
+        # Every context but the caller's was closed with the pool
+        self.assertTrue(all(c.closed for c in browser.contexts if c is not context))
+        self.assertFalse(context.closed)
+
+
+class TestOperationTimeout(unittest.TestCase):
+    """Tests for scaling per-operation timeouts with BROWSER_TIMEOUT_MS."""
+    
+    def timeout_with(self, browser_timeout_ms):
+        config = MagicMock(browser_timeout_ms=browser_timeout_ms)
+        with patch.object(browser_pool, "get_config", return_value=config):
+            return operation_timeout_ms(CONTENT_LOAD_TIMEOUT_MS)
+    
+    def test_default_browser_timeout_keeps_base(self):
+        self.assertEqual(self.timeout_with(30000), CONTENT_LOAD_TIMEOUT_MS)
+    
+    def test_scales_with_browser_timeout(self):
+        """Raising BROWSER_TIMEOUT_MS lengthens the wait, lowering it shortens it."""
+        self.assertEqual(self.timeout_with(90000), 3 * CONTENT_LOAD_TIMEOUT_MS)
+        self.assertEqual(self.timeout_with(15000), CONTENT_LOAD_TIMEOUT_MS // 2)
+
+
+class TestEngineLoop(unittest.TestCase):
+    """Tests for run_sync() and shutdown() on the engine event loop."""
+    
+    def tearDown(self):
+        shutdown()
+    
+    def test_run_sync_runs_on_engine_thread(self):
+        """Coroutines run on the daemon engine loop, not the caller's thread."""
+        async def thread_name():
+            return threading.current_thread().name
+        
+        self.assertEqual(run_sync(thread_name()), "engine-event-loop")
+        self.assertTrue(browser_pool._loop_thread.daemon)
+    
+    def test_run_sync_rejects_calls_from_engine_loop(self):
+        """Blocking on the engine loop from itself would deadlock."""
+        async def nested():
+            return run_sync(asyncio.sleep(0))
+        
+        with self.assertRaises(RuntimeError):
+            run_sync(nested())
+    
+    def test_shutdown_stops_loop_and_run_sync_restarts_it(self):
+        """shutdown() is idempotent and a later run_sync() starts a new loop."""
+        run_sync(asyncio.sleep(0))
+        thread = browser_pool._loop_thread
+        
+        shutdown()
+        shutdown()
+        
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(browser_pool._loop)
+        self.assertEqual(run_sync(asyncio.sleep(0, result=42)), 42)
+
+
+if __name__ == "__main__":
+    unittest.main()
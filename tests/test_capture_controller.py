@@ -0,0 +1,112 @@
+"""
+Tests for screencast frame handling in the capture controller.
+"""
+
+import asyncio
+import base64
+import unittest
+from unittest.mock import patch
+
+from src.engine.capture_controller import CaptureController, _resample_frames
+
+
+class TestResampleFrames(unittest.TestCase):
+    """Tests for resampling screencast frames onto a constant frame rate."""
+    
+    def test_slot_count_matches_duration(self):
+        """One output frame per slot of the requested duration."""
+        frames = [(10.0, b"a")]
+        self.assertEqual(len(_resample_frames(frames, fps=30, duration=2.0)), 60)
+    
+    def test_holds_latest_frame_until_next_change(self):
+        """Each slot repeats the most recent frame shown at that instant."""
+        frames = [(10.0, b"a"), (10.25, b"b"), (10.6, b"c")]
+        self.assertEqual(
+            _resample_frames(frames, fps=4, duration=1.0),
+            [b"a", b"b", b"b", b"c"]
+        )
+    
+    def test_holds_last_frame_to_the_end(self):
+        """A page that stops repainting keeps its last frame on screen."""
+        frames = [(10.0, b"a"), (10.1, b"b")]
+        self.assertEqual(_resample_frames(frames, fps=2, duration=2.0), [b"a", b"b", b"b", b"b"])
+    
+    def test_empty_input_raises(self):
+        """No frames at all is an error rather than an empty video."""
+        with self.assertRaises(RuntimeError):
+            _resample_frames([], fps=30, duration=1.0)
+
+
+class FakeCDPSession:
+    """CDP session that emits a fixed list of screencast frames."""
+    
+    def __init__(self, timestamps):
+        self.timestamps = timestamps
+        self.handler = None
+        self.acks = []
+        self.detached = False
+    
+    def on(self, event, handler):
+        self.handler = handler
+    
+    async def send(self, method, params=None):
+        if self.detached:
+            raise RuntimeError("Target page, context or browser has been closed")
+        if method == "Page.startScreencast":
+            for i, timestamp in enumerate(self.timestamps):
+                asyncio.ensure_future(self.handler({
+                    "data": base64.b64encode(b"frame%d" % i).decode(),
+                    "metadata": {"timestamp": timestamp},
+                    "sessionId": i,
+                }))
+        elif method == "Page.screencastFrameAck":
+            self.acks.append(params["sessionId"])
+    
+    async def detach(self):
+        self.detached = True
+
+
+class FakeContext:
+    """Context whose CDP session is a FakeCDPSession."""
+    
+    def __init__(self, cdp):
+        self.cdp = cdp
+    
+    async def new_cdp_session(self, page):
+        return self.cdp
+
+
+class TestScreencast(unittest.IsolatedAsyncioTestCase):
+    """Tests for CaptureController._screencast()."""
+    
+    def setUp(self):
+        for target in ("src.engine.capture_controller.get_config",
+                       "src.engine.browser_pool.get_config"):
+            patcher = patch(target)
+            patcher.start().return_value.browser_timeout_ms = 30000
+            self.addCleanup(patcher.stop)
+        self.controller = CaptureController()
+    
+    async def test_stops_at_end_of_cycle_without_late_acks(self):
+        """Frames past the cycle end are dropped and never acknowledged."""
+        cdp = FakeCDPSession([0.0, 0.5, 1.0, 1.5, 2.0])
+        
+        frames = await self.controller._screencast(FakeContext(cdp), None, 1.0, 100, 100)
+        # Let the remaining frame handlers run after the session detached
+        await asyncio.sleep(0)
+        
+        self.assertEqual([t for t, _ in frames], [0.0, 0.5, 1.0])
+        self.assertEqual(cdp.acks, [0, 1])
+    
+    async def test_no_frames_raises(self):
+        """A page that never paints fails with a clear error, not a bare timeout."""
+        cdp = FakeCDPSession([])
+        
+        with patch("src.engine.capture_controller.operation_timeout_ms", return_value=10):
+            with self.assertRaisesRegex(RuntimeError, "No screencast frame arrived"):
+                await self.controller._screencast(FakeContext(cdp), None, 1.0, 100, 100)
+        self.assertTrue(cdp.detached)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for the batch and async entry points of the engine, with the browser
+work stubbed out.
+"""
+
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from src.engine import animation_applicator, capture_controller, mermaid_renderer
+from src.engine.browser_pool import shutdown
+
+
+class ConcurrencyProbe:
+    """Stub coroutine function that records how many calls overlap."""
+    
+    def __init__(self, delays):
+        self.delays = delays
+        self.active = 0
+        self.peak = 0
+    
+    async def __call__(self, item, *args):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays[item])
+            return {"result": item}
+        finally:
+            self.active -= 1
+
+
+class TestBatchEntryPoints(unittest.TestCase):
+    """Tests for render_many() and capture_videos()."""
+    
+    def tearDown(self):
+        shutdown()
+    
+    def test_render_many_bounds_concurrency_and_keeps_order(self):
+        """Renders overlap up to the limit and results follow the input order."""
+        codes = ["a", "b", "c", "d", "e"]
+        # Earlier diagrams finish last, so completion order is reversed
+        probe = ConcurrencyProbe({code: 0.05 - i * 0.01 for i, code in enumerate(codes)})
+        
+        with patch.object(mermaid_renderer, "MAX_CONCURRENT_RENDERS", 2), \
+                patch.object(mermaid_renderer, "_render_cached", probe):
+            results = mermaid_renderer.render_many(codes)
+        
+        self.assertEqual(results, [{"result": code} for code in codes])
+        self.assertEqual(probe.peak, 2)
+    
+    def test_capture_videos_bounds_concurrency_and_keeps_order(self):
+        """Captures overlap up to the limit and states come back in order."""
+        states = [f"state{i}" for i in range(5)]
+        probe = ConcurrencyProbe({state: 0.05 - i * 0.01 for i, state in enumerate(states)})
+        
+        with patch.object(capture_controller, "MAX_CONCURRENT_CAPTURES", 3), \
+                patch.object(capture_controller, "_capture_video_async", probe):
+            results = capture_controller.capture_videos(states)
+        
+        self.assertEqual(results, [{"result": state} for state in states])
+        self.assertEqual(probe.peak, 3)
+
+
+class TestAsyncNodes(unittest.IsolatedAsyncioTestCase):
+    """Tests for the *_node_async variants used with ainvoke()."""
+    
+    def tearDown(self):
+        shutdown()
+    
+    async def check_runs_on_engine_loop(self, module, impl_name, node):
+        async def impl(state):
+            return {**state, "thread": threading.current_thread().name}
+        
+        with patch.object(module, impl_name, impl):
+            result = await node({"key": "value"})
+        
+        self.assertEqual(result, {"key": "value", "thread": "engine-event-loop"})
+    
+    async def test_render_mermaid_node_async(self):
+        await self.check_runs_on_engine_loop(
+            mermaid_renderer, "_render_mermaid_async",
+            mermaid_renderer.render_mermaid_node_async
+        )
+    
+    async def test_apply_animation_node_async(self):
+        await self.check_runs_on_engine_loop(
+            animation_applicator, "_apply_animation_async",
+            animation_applicator.apply_animation_node_async
+        )
+    
+    async def test_capture_video_node_async(self):
+        await self.check_runs_on_engine_loop(
+            capture_controller, "_capture_video_async",
+            capture_controller.capture_video_node_async
+        )
+    
+    async def test_caller_loop_stays_free(self):
+        """The caller's loop keeps running while the engine loop does the work."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        
+        async def impl(state):
+            await asyncio.get_running_loop().run_in_executor(None, release.wait)
+            return state
+        
+        with patch.object(mermaid_renderer, "_render_mermaid_async", impl):
+            node = asyncio.create_task(mermaid_renderer.render_mermaid_node_async({}))
+            # These sleeps only complete if the caller's loop is not blocked
+            for _ in range(3):
+                await asyncio.sleep(0.01)
+            self.assertFalse(node.done())
+            release.set()
+            self.assertEqual(await asyncio.wait_for(node, timeout=1), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
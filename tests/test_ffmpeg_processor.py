@@ -0,0 +1,52 @@
+"""
+Tests for FFmpeg output parsing.
+"""
+
+import unittest
+
+from src.engine.ffmpeg_processor import _parse_input_info
+
+
+STDERR = """\
+ffmpeg version 6.0 Copyright (c) 2000-2023 the FFmpeg developers
+Input #0, matroska,webm, from 'mermaid_1.mkv':
+  Metadata:
+    ENCODER         : Lavf60.3.100
+  Duration: 00:01:05.50, start: 0.000000, bitrate: 5120 kb/s
+  Stream #0:0: Video: png, rgba(pc), 1280x720, 30 fps, 30 tbr, 1k tbn (default)
+Stream mapping:
+  Stream #0:0 (png) -> split:default
+Output #0, gif, to 'mermaid_1.gif':
+  Stream #0:0: Video: gif, pal8(pc), 640x360, q=2-31, 200 kb/s, 15 fps, 100 tbn
+"""
+
+
+class TestParseInputInfo(unittest.TestCase):
+    """Tests for reading input metadata from FFmpeg's stderr."""
+    
+    def test_reads_input_section(self):
+        """Duration, size and frame rate come from the input, not the output."""
+        self.assertEqual(_parse_input_info(STDERR), {
+            "duration": 65.5,
+            "width": 1280,
+            "height": 720,
+            "fps": 30.0,
+        })
+    
+    def test_falls_back_to_tbr(self):
+        """Streams without an fps field report their rate as tbr."""
+        stderr = STDERR.replace("30 fps, 30 tbr", "29.97 tbr")
+        self.assertEqual(_parse_input_info(stderr)["fps"], 29.97)
+    
+    def test_missing_fields_are_zero(self):
+        """Unreported metadata yields zeros rather than an error."""
+        self.assertEqual(_parse_input_info("Input #0, image2pipe, from 'pipe:':\n"), {
+            "duration": 0.0,
+            "width": 0,
+            "height": 0,
+            "fps": 0.0,
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
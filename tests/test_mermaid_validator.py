@@ -0,0 +1,86 @@
+"""
+Tests for the rule-based Mermaid syntax validator.
+"""
+
+import unittest
+from unittest.mock import patch
+
+from src.engine.mermaid_validator import MermaidValidator
+
+
+class TestMermaidValidator(unittest.TestCase):
+    """Tests for MermaidValidator.validate()."""
+    
+    def setUp(self):
+        patcher = patch("src.engine.mermaid_validator.get_config")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.validator = MermaidValidator()
+    
+    def test_valid_flowchart(self):
+        """A well-formed flowchart passes."""
+        code = "graph TD\n    A[Start] --> B(Process)\n    B --> C{Done}"
+        self.assertEqual(self.validator.validate(code), (True, None))
+    
+    def test_empty_code(self):
+        """Empty or blank code is rejected with a line-0 error."""
+        self.assertEqual(
+            self.validator.validate("  \n "),
+            (False, [{"message": "Empty Mermaid code", "line": 0}])
+        )
+    
+    def test_diagram_type_is_case_insensitive(self):
+        """Type declarations match regardless of case."""
+        self.assertTrue(self.validator.validate("sequenceDiagram\n    A->>B: hi")[0])
+        self.assertTrue(self.validator.validate("STATEDIAGRAM-v2\n    [*] --> A")[0])
+    
+    def test_missing_diagram_type(self):
+        """Code without a known type declaration fails on line 1."""
+        is_valid, errors = self.validator.validate("A --> B\nB --> C")
+        
+        self.assertFalse(is_valid)
+        self.assertEqual(errors[0]["line"], 1)
+        self.assertIn("quadrantChart", errors[0]["message"])
+    
+    def test_single_line_without_semicolons(self):
+        """Several statements on one line need semicolons."""
+        is_valid, errors = self.validator.validate("graph TD A-->B")
+        
+        self.assertFalse(is_valid)
+        self.assertIn("semicolons", errors[0]["message"])
+        self.assertTrue(self.validator.validate("graph TD; A-->B;")[0])
+    
+    def test_mismatched_brackets_reported_per_line(self):
+        """Each line with unbalanced brackets is reported with its number."""
+        code = "graph TD\n    A[Start --> B\n    %% comment (\n\n    B --> C)"
+        is_valid, errors = self.validator.validate(code)
+        
+        self.assertFalse(is_valid)
+        self.assertEqual([e["line"] for e in errors], [2, 5])
+    
+    def test_brace_diagrams_skip_bracket_check(self):
+        """ER, class and state diagrams use multi-line braces."""
+        er = "erDiagram\n    CUSTOMER ||--o{ ORDER : places"
+        cls = "classDiagram\n    class Animal {\n        +name\n    }"
+        state = "stateDiagram-v2\n    state Moving {\n        A --> B\n    }"
+        
+        for code in (er, cls, state):
+            self.assertEqual(self.validator.validate(code), (True, None))
+    
+    def test_non_ascii_labels(self):
+        """Non-ASCII text does not disturb bracket counting."""
+        code = "graph LR\n    A[Café ☕] --> B(Ünïcode)"
+        self.assertEqual(self.validator.validate(code), (True, None))
+    
+    def test_cached_errors_are_fresh_per_call(self):
+        """Repeat validations return equal errors that callers may modify."""
+        code = "graph TD\n    A[Start --> B"
+        _, first = self.validator.validate(code)
+        first.clear()
+        
+        _, second = self.validator.validate(code)
+        self.assertEqual(second, [{"message": "Mismatched brackets/parentheses", "line": 2}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests for the content-addressed render cache.
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.engine.render_cache import RenderCache
+
+
+RESULT = {
+    "html": "<!DOCTYPE html><html><body><svg></svg></body></html>",
+    "svg": "<svg></svg>",
+    "width": 120,
+    "height": 80,
+    "animated": True,
+    "paths_animated": 2,
+}
+
+
+class TestRenderCache(unittest.TestCase):
+    """Tests for RenderCache keying, LRU, and disk persistence."""
+    
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self._tmp.name) / "renders"
+    
+    def tearDown(self):
+        self._tmp.cleanup()
+    
+    def test_key_depends_on_source_and_duration(self):
+        """Different source or duration must not share an entry."""
+        base = RenderCache.key("graph TD\n  A-->B", 5.0)
+        
+        self.assertEqual(base, RenderCache.key("graph TD\n  A-->B", 5.0))
+        self.assertNotEqual(base, RenderCache.key("graph TD\n  A-->C", 5.0))
+        self.assertNotEqual(base, RenderCache.key("graph TD\n  A-->B", 3.0))
+        self.assertNotEqual(base, RenderCache.key("graph TD\n  A-->B", None))
+    
+    def test_key_depends_on_mermaid_build(self):
+        """Renders from one Mermaid.js build are not served for another."""
+        self.assertNotEqual(
+            RenderCache.key("graph TD\n  A-->B", 5.0, "build-a"),
+            RenderCache.key("graph TD\n  A-->B", 5.0, "build-b")
+        )
+    
+    def test_miss_then_hit(self):
+        """A stored result is returned for the same key."""
+        cache = RenderCache(self.cache_dir)
+        key = RenderCache.key("graph TD\n  A-->B", 5.0)
+        
+        self.assertIsNone(cache.get(key))
+        cache.put(key, RESULT)
+        self.assertEqual(cache.get(key), RESULT)
+    
+    def test_disk_entry_survives_new_instance(self):
+        """Entries persist on disk across cache instances."""
+        key = RenderCache.key("graph TD\n  A-->B", 5.0)
+        RenderCache(self.cache_dir).put(key, RESULT)
+        
+        self.assertEqual(RenderCache(self.cache_dir).get(key), RESULT)
+    
+    def test_memory_lru_evicts_oldest(self):
+        """Only the most recent entries stay in memory; disk still has all."""
+        cache = RenderCache(self.cache_dir, max_entries=2)
+        keys = [RenderCache.key(f"graph TD\n  A-->{n}", 5.0) for n in "BCD"]
+        for key in keys:
+            cache.put(key, RESULT)
+        
+        self.assertNotIn(keys[0], cache._memory)
+        self.assertIn(keys[2], cache._memory)
+        self.assertEqual(cache.get(keys[0]), RESULT)
+    
+    def test_disk_evicts_least_recently_used(self):
+        """Disk keeps at most max_disk_entries files, dropping the stalest."""
+        cache = RenderCache(self.cache_dir, max_entries=1, max_disk_entries=2)
+        keys = [RenderCache.key(f"graph TD\n  A-->{n}", 5.0) for n in "BCD"]
+        cache.put(keys[0], RESULT)
+        cache.put(keys[1], RESULT)
+        # Age both entries, then read the second back so it is fresher
+        for key in keys[:2]:
+            os.utime(self.cache_dir / f"{key}.json", (1, 1))
+        self.assertEqual(RenderCache(self.cache_dir).get(keys[1]), RESULT)
+        
+        cache.put(keys[2], RESULT)
+        
+        self.assertEqual(
+            sorted(p.stem for p in self.cache_dir.glob("*.json")),
+            sorted(keys[1:])
+        )
+    
+    def test_async_get_and_put(self):
+        """The async variants read and write the same entries."""
+        key = RenderCache.key("graph TD\n  A-->B", 5.0)
+        
+        async def roundtrip():
+            await RenderCache(self.cache_dir).put_async(key, RESULT)
+            return await RenderCache(self.cache_dir).get_async(key)
+        
+        self.assertEqual(asyncio.run(roundtrip()), RESULT)
+    
+    def test_gantt_with_today_marker_is_not_cacheable(self):
+        """Gantt charts mark the current date unless the marker is off."""
+        gantt = "gantt\n  title Plan\n  section A\n  Task :a1, 2024-01-01, 3d"
+        
+        self.assertTrue(RenderCache.is_cacheable("graph TD\n  A-->B"))
+        self.assertFalse(RenderCache.is_cacheable(gantt))
+        self.assertTrue(RenderCache.is_cacheable(gantt + "\n  todayMarker off"))
+    
+    def test_corrupt_entry_is_a_miss(self):
+        """Unreadable disk entries are ignored rather than raised."""
+        key = RenderCache.key("graph TD\n  A-->B", 5.0)
+        self.cache_dir.mkdir(parents=True)
+        (self.cache_dir / f"{key}.json").write_text("{not json", encoding="utf-8")
+        
+        self.assertIsNone(RenderCache(self.cache_dir).get(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,8 @@ from unittest.mock import Mock, patch, AsyncMock
 from pathlib import Path
 import json
 
+import ffmpeg
+
 from src.core.state import create_initial_state
 from src.core.graph import run_graph
 
@@ -24,9 +26,9 @@ class TestMermaidGIFSmoke(unittest.TestCase):
     - FFmpeg processing
     """
     
-    @patch('src.core.graph.capture_controller')
-    @patch('src.core.graph.animation_applicator')
-    @patch('src.core.graph.render_diagram_node')
+    @patch('src.core.graph.capture_video_node')
+    @patch('src.core.graph.apply_animation_node')
+    @patch('src.core.graph.render_mermaid_node')
     @patch('src.agents.intent.get_config')
     @patch('src.agents.fixer.get_config')
     @patch('src.engine.mermaid_renderer.get_config')
@@ -35,14 +37,14 @@ class TestMermaidGIFSmoke(unittest.TestCase):
     @patch('src.engine.animation_applicator.get_config')
     @patch('src.engine.capture_controller.get_config')
     @patch('src.engine.ffmpeg_processor.ffmpeg')
-    @patch('src.engine.mermaid_renderer.async_playwright')
+    @patch('src.engine.browser_pool.get_browser_pool')
     @patch('src.agents.intent.litellm.completion')
     @patch('src.agents.fixer.litellm.completion')
     def test_end_to_end_success(
         self,
         mock_fixer_llm,
         mock_intent_llm,
-        mock_playwright,
+        mock_get_browser_pool,
         mock_ffmpeg,
         mock_capture_config,
         mock_animation_config,
@@ -181,17 +183,9 @@ class TestMermaidGIFSmoke(unittest.TestCase):
         mock_browser.new_page = AsyncMock(return_value=mock_page)
         mock_browser.close = AsyncMock()
         
-        # Create mock playwright instance
-        mock_pw_instance = AsyncMock()
-        mock_pw_instance.chromium.launch = AsyncMock(return_value=mock_browser)
-        
-        # Mock async_playwright context manager
-        mock_pw_context = AsyncMock()
-        mock_pw_context.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-        mock_pw_context.__aexit__ = AsyncMock()
-        mock_pw_context.start = AsyncMock(return_value=mock_pw_instance)
-        
-        mock_playwright.return_value = mock_pw_context
+        # Hand out the mock browser from the shared pool, so the pipeline's
+        # background prewarm never launches Chromium
+        mock_get_browser_pool.return_value.get_browser = AsyncMock(return_value=mock_browser)
         
         # ============================================
         # Mock FFmpeg
@@ -202,7 +196,7 @@ class TestMermaidGIFSmoke(unittest.TestCase):
         
         # Mock split filter
         mock_split = [Mock(), Mock()]
-        mock_input_stream.video.filter = Mock(return_value=mock_split)
+        mock_input_stream.video.split = Mock(return_value=mock_split)
         
         # Mock palette generation
         mock_split[0].filter = Mock(return_value=Mock())
@@ -220,10 +214,15 @@ class TestMermaidGIFSmoke(unittest.TestCase):
         
         # Mock ffmpeg.output()
         mock_output = Mock()
+        mock_output.global_args = Mock(return_value=mock_output)
         mock_output.overwrite_output = Mock(return_value=mock_output)
         mock_output.run = Mock()
         mock_ffmpeg.output = Mock(return_value=mock_output)
         
+        # The processor catches ffmpeg.Error explicitly, so it must stay a real
+        # exception class on the mocked module
+        mock_ffmpeg.Error = ffmpeg.Error
+        
         # Mock ffmpeg.input()
         mock_ffmpeg.input = Mock(return_value=mock_input_stream)
         
@@ -256,12 +255,18 @@ class TestMermaidGIFSmoke(unittest.TestCase):
             def mock_run_side_effect(*args, **kwargs):
                 # Create the GIF file when FFmpeg runs
                 gif_path.write_bytes(b"GIF89a" + b"\x00" * 100)  # Minimal GIF header + data
-                return None
+                # The input description is read from FFmpeg's stderr
+                stderr = (
+                    b"Input #0, matroska,webm, from 'output.webm':\n"
+                    b"  Duration: 00:00:05.00, start: 0.000000, bitrate: 512 kb/s\n"
+                    b"  Stream #0:0: Video: png, rgba(pc), 1200x800, 30 fps, 30 tbr\n"
+                )
+                return b"", stderr
             
             mock_output.run.side_effect = mock_run_side_effect
             
             # Also patch the video_path in capture_controller placeholder
-            with patch('src.core.graph.capture_controller') as mock_capture:
+            with patch('src.core.graph.capture_video_node') as mock_capture:
                 def capture_side_effect(state):
                     state["video_path"] = str(video_path)
                     return state